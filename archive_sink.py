@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# Streaming .tar.gz/.zip writer for whole-site bundles.
+#
+# Entries go straight into the compressed stream as they are added, so a
+# bundle of two million pages is written in one pass with constant memory
+# and no loose files. The output is reproducible: every entry gets the same
+# timestamp (SOURCE_DATE_EPOCH if set, else 1980-01-01, the earliest a zip
+# can hold), owner and permissions, the gzip header carries no time or
+# name, and entries stay in the order they were added. Like PackWriter the
+# archive is written under a temp name and only replaces PATH once complete.
+#
+# A zip has to end with a directory of every entry, so zipfile holds one
+# small record per entry until close(); .tar.gz has no such directory and
+# stays flat however many pages go in.
+import gzip
+import io
+import os
+import shutil
+import tarfile
+import time
+import zipfile
+
+FORMATS = ('.tar.gz', '.tgz', '.zip')
+MTIME = int(os.environ.get('SOURCE_DATE_EPOCH', 315532800))
+
+
+def archive_format(path):
+    # 'tar' or 'zip' from the file name, or None
+    name = path.lower()
+    if name.endswith('.zip'):
+        return 'zip'
+    if name.endswith(('.tar.gz', '.tgz')):
+        return 'tar'
+    return None
+
+
+class ArchiveWriter:
+    def __init__(self, path):
+        self.path = path
+        self.format = archive_format(path)
+        if self.format is None:
+            raise ValueError(f'{path}: archive name must end in {", ".join(FORMATS)}')
+        self.count = 0
+        self._tmp = path + '.tmp'
+        self._raw = open(self._tmp, 'wb')
+        if self.format == 'zip':
+            self._zip = zipfile.ZipFile(self._raw, 'w')
+        else:
+            self._gzip = gzip.GzipFile(filename='', fileobj=self._raw, mode='wb', mtime=0)
+            # Stream mode: entries are written through, never seeked back to
+            self._tar = tarfile.open(fileobj=self._gzip, mode='w|', format=tarfile.PAX_FORMAT)
+
+    def _tar_info(self, name, size):
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = MTIME
+        info.mode = 0o644
+        info.uid = info.gid = 0
+        info.uname = info.gname = ''
+        return info
+
+    def _zip_info(self, name, size=0):
+        info = zipfile.ZipInfo(name, date_time=time.gmtime(max(MTIME, 315532800))[:6])
+        info.file_size = size
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.create_system = 3
+        info.external_attr = 0o644 << 16
+        return info
+
+    def add(self, name, data):
+        if self.format == 'zip':
+            self._zip.writestr(self._zip_info(name), data)
+        else:
+            self._tar.addfile(self._tar_info(name, len(data)), io.BytesIO(data))
+            self._forget()
+        self.count += 1
+
+    def add_file(self, name, path):
+        # Copies a file on disk into the archive in chunks
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if self.format == 'zip':
+                with self._zip.open(self._zip_info(name, size), 'w') as entry:
+                    shutil.copyfileobj(f, entry)
+            else:
+                self._tar.addfile(self._tar_info(name, size), f)
+                self._forget()
+        self.count += 1
+
+    def _forget(self):
+        # TarFile keeps every member it has written; a stream never needs
+        # them again
+        self._tar.members.clear()
+
+    def close(self):
+        if self.format == 'zip':
+            self._zip.close()
+        else:
+            self._tar.close()
+            self._gzip.close()
+        self._raw.close()
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        self._raw.close()
+        os.remove(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
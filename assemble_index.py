@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# Marker-based assembly of index.html.
+#
+# Generated parts of the page live between marker comments:
+#
+#     <!-- BEGIN GENERATED: catalog -->
+#     ...
+#     <!-- END GENERATED: catalog -->
+#
+# assemble() streams the page line by line into a temp file, swapping the
+# body of each requested section for freshly generated lines, and only
+# replaces the page when the result differs. Section bodies are iterables of
+# lines, so a section can be far larger than memory. A missing, unterminated
+# or duplicated marker is an error and leaves the page untouched.
+#
+# Other line-oriented files can use the same scheme with their own comment
+# syntax by passing markers, e.g. REDIRECT_MARKERS for Netlify's _redirects
+# and _headers (see update_block()).
+import argparse
+import filecmp
+import os
+import sys
+
+BEGIN = '<!-- BEGIN GENERATED: {} -->'
+END = '<!-- END GENERATED: {} -->'
+REDIRECT_MARKERS = ('# BEGIN GENERATED: {}', '# END GENERATED: {}')
+
+
+class MarkerError(Exception):
+    pass
+
+
+def assemble(path, sections, markers=(BEGIN, END)):
+    # sections: name -> callable returning an iterable of lines (without
+    # newlines). Returns True if the page changed.
+    begin, end = markers
+    tmp = path + '.tmp'
+    found = set()
+    try:
+        with open(path, 'r', encoding='utf-8', newline='') as src, \
+                open(tmp, 'w', encoding='utf-8', newline='') as dst:
+            lines = iter(src)
+            for line in lines:
+                dst.write(line)
+                name = _marker(line, begin)
+                if name is None or name not in sections:
+                    continue
+                if name in found:
+                    raise MarkerError(f'{path}: section {name!r} appears twice')
+                found.add(name)
+                newline = '\r\n' if line.endswith('\r\n') else '\n'
+                for generated in sections[name]():
+                    dst.write(generated + newline)
+                for line in lines:
+                    if _marker(line, end) == name:
+                        dst.write(line)
+                        break
+                else:
+                    raise MarkerError(f'{path}: section {name!r} has no END marker')
+        missing = sections.keys() - found
+        if missing:
+            raise MarkerError(f'{path}: no BEGIN marker for {", ".join(sorted(missing))}')
+    except BaseException:
+        # The temp file only exists if the page could be opened
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+    if filecmp.cmp(tmp, path, shallow=False):
+        os.remove(tmp)
+        return False
+    os.replace(tmp, path)
+    return True
+
+
+def update_block(path, name, lines, markers=REDIRECT_MARKERS, create=True):
+    # assemble() for a single section of a line-based config file such as
+    # _redirects or _headers. A missing block is added at the top of the file
+    # (ahead of any catch-all rules), or left out if create is false.
+    begin, end = (marker.format(name) for marker in markers)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            rules = f.read()
+    except FileNotFoundError:
+        rules = ''
+    if begin not in rules:
+        if not create:
+            return False
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f'{begin}\n{end}\n{rules}')
+    return assemble(path, {name: lines}, markers=markers)
+
+
+def _marker(line, pattern):
+    line = line.strip()
+    prefix, suffix = pattern.split('{}')
+    if line.startswith(prefix) and line.endswith(suffix):
+        return line[len(prefix):len(line) - len(suffix)]
+    return None
+
+
+def main(argv=None, prog=None):
+    import update_index
+    import update_index_million
+
+    parser = argparse.ArgumentParser(description='Regenerate the marked sections of index.html.',
+                                     prog=prog)
+    parser.add_argument('sections', nargs='*',
+                        help='sections to regenerate: catalog, million-games (default: all)')
+    parser.add_argument('--out', default='.', help='site directory')
+    parser.add_argument('--index', help='page to update (default: index.html in --out)')
+    args = parser.parse_args(argv)
+    args.index = args.index or os.path.join(args.out, 'index.html')
+
+    known = {
+        'catalog': update_index.section_lines,
+        'million-games': update_index_million.section_lines,
+    }
+
+    names = args.sections or sorted(known)
+    unknown = set(names) - known.keys()
+    if unknown:
+        parser.error(f'unknown section {", ".join(sorted(unknown))}')
+    try:
+        changed = assemble(args.index, {name: known[name] for name in names})
+    except MarkerError as e:
+        print(f'Error: {e}')
+        return 1
+    except OSError as e:
+        print(f'Error: cannot update {args.index}: {e.strerror}')
+        return 1
+    print(f'{"Updated" if changed else "Unchanged"} {args.index} ({", ".join(names)})')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# Benchmarks for the site generators.
+#
+# Each case runs a generator's own main() with a command line, in a fresh
+# process (so peak RSS is its own) against a temporary output directory, so
+# everything a real run does (write pipeline, checkpoints, manifests) is in
+# the timing. It reports files/sec, MB/sec and peak RSS. The generator cases
+# also time a render-only pass (the same pages rendered and dropped), so the
+# render cost and the rest of the run (writing: the pipeline, manifests,
+# checkpoints) are reported apart. Results can be saved as JSON and compared
+# against an earlier run to catch regressions, in either part:
+#
+#     python3 bench_generators.py --million 104-50103 --save before.json
+#     ... change something ...
+#     python3 bench_generators.py --million 104-50103 --compare before.json
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+CASES = ('million', 'million-rerun', 'million-parallel', 'classic', 'fix', 'index')
+# Phases reported beside a case's run but not part of its time; 'write' is
+# the run less its render-only pass
+SPLIT_PHASES = ('render', 'write')
+
+
+class Timer:
+    def __init__(self):
+        self.phases = {}
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+def _run(main, argv, timer, phase='run'):
+    # Runs a generator the way its command line does, output discarded
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        status = main(argv)
+    timer.add(phase, time.perf_counter() - t0)
+    if status:
+        raise RuntimeError(f'{" ".join(argv)} exited with {status}')
+
+
+def _render(render, timer):
+    # Times render(), which renders pages without writing them and returns
+    # their total size
+    t0 = time.perf_counter()
+    render()
+    timer.add('render', time.perf_counter() - t0)
+
+
+def _outputs(out_dir, name):
+    # (files, bytes) listed in a generator's manifest in out_dir
+    from build_manifest import load_manifest
+    files = load_manifest(os.path.join(out_dir, f'.manifest-{name}.json'))
+    return len(files), sum(os.path.getsize(os.path.join(out_dir, f)) for f in files)
+
+
+def _million_argv(out_dir, params):
+    start, end = params['million']
+    return ['--out', out_dir, '--start', str(start), '--end', str(end)]
+
+
+def bench_million(out_dir, params, timer, rerun=False):
+    import generate_million_games as million
+    argv = _million_argv(out_dir, params)
+    if rerun:
+        # Untimed first pass; the timed pass below should skip everything
+        _run(million.main, argv, Timer())
+    _run(million.main, argv, timer)
+    _render(lambda: _render_million(out_dir, params), timer)
+    return _outputs(out_dir, million.MANIFEST_NAME)
+
+
+def _render_million(out_dir, params, workers=1, shard_size=None):
+    # The run's pages, rendered against its assets the way --pack does
+    import generate_million_games as million
+    start, end = params['million']
+    return sum(len(html) + len(js) for _, html, js in million.iter_rendered(
+        start, end + 1, workers, shard_size or million.SHARD_SIZE, site_dir=out_dir))
+
+
+def bench_million_parallel(out_dir, params, timer):
+    import generate_million_games as million
+    start, end = params['million']
+    shard_size = max(1000, (end + 1 - start) // (params['workers'] * 4))
+    _run(million.main, _million_argv(out_dir, params) + [
+        '-j', str(params['workers']), '--shard-size', str(shard_size)], timer)
+    _render(lambda: _render_million(out_dir, params, params['workers'], shard_size), timer)
+    return _outputs(out_dir, million.MANIFEST_NAME)
+
+
+def _classic_argv(out_dir, params):
+    first, last = params['classic']
+    return [out_dir, '--start', str(first), '--end', str(last)]
+
+
+def bench_classic(out_dir, params, timer):
+    import generate_games
+    _run(generate_games.main, _classic_argv(out_dir, params), timer)
+    _render(lambda: _render_classic(params), timer)
+    return _outputs(out_dir, 'generate_games')
+
+
+def _render_classic(params):
+    import generate_games
+    first, last = params['classic']
+    size = 0
+    for i in range(max(first, generate_games.FIRST_GAME), min(last, generate_games.LAST_GAME) + 1):
+        name, icon, desc, _ = generate_games.games[i - generate_games.FIRST_GAME]
+        html, js = generate_games.render_game(i, name, icon, desc)
+        size += len(html) + len(js)
+    return size
+
+
+def bench_fix(out_dir, params, timer):
+    # Patches the placeholders of an untimed classic run, as the site build
+    # does; counts every script it classifies, written or not
+    import fix_all_games
+    import generate_games
+    _run(generate_games.main, _classic_argv(out_dir, params), Timer())
+    _run(fix_all_games.main, [out_dir, '-j', str(params['workers'])], timer)
+    _render(lambda: sum(len(data) for _, data in fix_all_games.planned_files()), timer)
+    files = [data for _, data in fix_all_games.planned_files()]
+    return len(files), sum(map(len, files))
+
+
+def bench_index(out_dir, params, timer):
+    import update_index
+    import update_index_million
+    from assemble_index import assemble
+    index = os.path.join(out_dir, 'index.html')
+    shutil.copyfile(params['index'], index)
+    t0 = time.perf_counter()
+    assemble(index, {'catalog': update_index.section_lines,
+                     'million-games': update_index_million.section_lines})
+    timer.add('assemble', time.perf_counter() - t0)
+    return 1, os.path.getsize(index)
+
+
+def run_case(case, params):
+    # Runs in a fresh worker process
+    timer = Timer()
+    with tempfile.TemporaryDirectory(prefix=f'bench-{case}-', dir=params['tmp']) as out_dir:
+        if case == 'million':
+            files, size = bench_million(out_dir, params, timer)
+        elif case == 'million-rerun':
+            files, size = bench_million(out_dir, params, timer, rerun=True)
+        elif case == 'million-parallel':
+            files, size = bench_million_parallel(out_dir, params, timer)
+        elif case == 'classic':
+            files, size = bench_classic(out_dir, params, timer)
+        elif case == 'fix':
+            files, size = bench_fix(out_dir, params, timer)
+        else:
+            files, size = bench_index(out_dir, params, timer)
+    # Only the timed phases count, not setup such as a rerun's first pass,
+    # nor the render-only pass, which is set against the run instead
+    seconds = sum(v for phase, v in timer.phases.items() if phase not in SPLIT_PHASES)
+    if 'render' in timer.phases:
+        timer.phases['write'] = max(seconds - timer.phases['render'], 0.0)
+    return {
+        'files': files,
+        'bytes': size,
+        'seconds': seconds,
+        'files_per_sec': files / seconds,
+        'mb_per_sec': size / seconds / 1e6,
+        # Largest of this process and any pool workers it started (KB on Linux)
+        'peak_rss_mb': max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                           resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1024,
+        'phases': timer.phases,
+    }
+
+
+def run_benchmarks(cases, params, repeat=1):
+    ctx = multiprocessing.get_context('spawn')
+    results = {}
+    for case in cases:
+        runs = []
+        for _ in range(repeat):
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                runs.append(pool.submit(run_case, case, params).result())
+        results[case] = min(runs, key=lambda r: r['seconds'])
+        r = results[case]
+        phases = ', '.join(f'{k} {v:.2f}s' for k, v in r['phases'].items())
+        print(f'{case:18} {r["files"]:>8} files {r["seconds"]:8.2f}s '
+              f'{r["files_per_sec"]:>10,.0f} files/s {r["mb_per_sec"]:7.1f} MB/s '
+              f'{r["peak_rss_mb"]:7.1f} MB RSS  ({phases})')
+    return results
+
+
+def compare(results, baseline, threshold):
+    # Returns the cases whose throughput dropped, or whose render or write
+    # time grew, by more than `threshold`
+    regressions = []
+    for case, r in results.items():
+        old = baseline['cases'].get(case)
+        if not old:
+            continue
+        change = r['files_per_sec'] / old['files_per_sec'] - 1
+        flag = ''
+        if change < -threshold:
+            flag = '  REGRESSION'
+            regressions.append(case)
+        print(f'{case:18} {old["files_per_sec"]:>10,.0f} -> {r["files_per_sec"]:>10,.0f} files/s '
+              f'({change:+.1%}), RSS {old["peak_rss_mb"]:.1f} -> {r["peak_rss_mb"]:.1f} MB{flag}')
+        for phase in SPLIT_PHASES:
+            before, after = old.get('phases', {}).get(phase), r['phases'].get(phase)
+            if not before or after is None:
+                continue
+            change = after / before - 1
+            flag = ''
+            if change > threshold:
+                flag = '  REGRESSION'
+                if case not in regressions:
+                    regressions.append(case)
+            print(f'{"":18}   {phase:6} {before:8.2f}s -> {after:8.2f}s ({change:+.1%}){flag}')
+    return regressions
+
+
+def parse_range(text):
+    first, _, last = text.partition('-')
+    return int(first), int(last or first)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the site generators.')
+    parser.add_argument('cases', nargs='*', help=f'cases to run: {", ".join(CASES)} (default: all)')
+    parser.add_argument('--million', type=parse_range, default=(104, 10103),
+                        help='million-game ID range, e.g. 104-50103 (default: 104-10103)')
+    parser.add_argument('--classic', type=parse_range, default=(2, 103),
+                        help='generate_games.py ID range (default: 2-103)')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(),
+                        help='workers for million-parallel and fix')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per case; the fastest is kept')
+    parser.add_argument('--tmp', default=None, help='directory for the scratch output trees')
+    parser.add_argument('--save', metavar='JSON', help='write results to this file')
+    parser.add_argument('--compare', metavar='JSON', help='compare against saved results')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='throughput drop that counts as a regression (default: 0.10)')
+    args = parser.parse_args(argv)
+
+    cases = args.cases or CASES
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error(f'unknown case {", ".join(sorted(unknown))}')
+    params = {'million': args.million, 'classic': args.classic, 'workers': args.workers,
+              'index': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index.html'),
+              'tmp': args.tmp}
+
+    results = run_benchmarks(cases, params, args.repeat)
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'million': args.million,
+            'classic': args.classic,
+            'workers': args.workers,
+        },
+        'cases': results,
+    }
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f'Saved {args.save}')
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# On-disk manifest of generated files (output path -> content hash).
+#
+# Generators hand every rendered file to Manifest.write(), which only touches
+# the disk when the bytes differ from what the last run recorded. Files that
+# the last run produced but this run didn't are removed by save(prune=True).
+# Files are replaced atomically (temp file + rename).
+import hashlib
+import json
+import os
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def load_manifest(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)['files']
+    except FileNotFoundError:
+        return {}
+    except (ValueError, KeyError):
+        print(f'Ignoring unreadable manifest {path}')
+        return {}
+
+
+class Manifest:
+    def __init__(self, out_dir, name, old=None):
+        self.out_dir = out_dir
+        self.path = os.path.join(out_dir, f'.manifest-{name}.json')
+        self.old = load_manifest(self.path) if old is None else old
+        self.files = {}
+        self.written = 0
+        self.skipped = 0
+        self.deleted = 0
+        self.bytes_written = 0
+
+    def subset(self, names):
+        # Old hashes for just these outputs, for handing to a worker process
+        return {n: self.old[n] for n in names if n in self.old}
+
+    def write(self, name, data):
+        digest, written = self.store(name, data)
+        self.record(name, digest, written, len(data))
+        return written
+
+    def store(self, name, data):
+        # The disk half of write(): returns (digest, written) and leaves the
+        # bookkeeping to record(), so writer threads can share one manifest
+        # (see write_pipeline.py) and only lock around record()
+        digest = content_hash(data)
+        path = os.path.join(self.out_dir, name)
+        if self.old.get(name) == digest:
+            try:
+                if os.stat(path).st_size == len(data):
+                    return digest, False
+            except FileNotFoundError:
+                pass
+        # Written under a temp name and renamed, so a crash never leaves a
+        # truncated file behind under the real name
+        tmp = path + '.tmp'
+        try:
+            f = open(tmp, 'wb')
+        except FileNotFoundError:
+            # First file in a subdirectory (sharded layouts)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            f = open(tmp, 'wb')
+        try:
+            with f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        return digest, True
+
+    def record(self, name, digest, written, size):
+        self.files[name] = digest
+        if written:
+            self.written += 1
+            self.bytes_written += size
+        else:
+            self.skipped += 1
+
+    def keep(self, name, data):
+        # Records an output that is already on disk with these exact bytes
+        self.files[name] = content_hash(data)
+        self.skipped += 1
+
+    def prune(self):
+        # Removes outputs the last run recorded that this run didn't produce
+        for name in self.old.keys() - self.files.keys():
+            try:
+                os.remove(os.path.join(self.out_dir, name))
+                self.deleted += 1
+            except FileNotFoundError:
+                pass
+            self._remove_empty_dirs(os.path.dirname(name))
+
+    def remove(self, name):
+        # Removes one output the last run recorded now, for a file this run
+        # retires even if it ends up partial and keeps the rest
+        if self.old.pop(name, None) is None:
+            return
+        try:
+            os.remove(os.path.join(self.out_dir, name))
+            self.deleted += 1
+        except FileNotFoundError:
+            pass
+        self._remove_empty_dirs(os.path.dirname(name))
+
+    def _remove_empty_dirs(self, subdir):
+        # Drops directories (below out_dir) that pruning left empty
+        while subdir:
+            try:
+                os.rmdir(os.path.join(self.out_dir, subdir))
+            except OSError:
+                return
+            subdir = os.path.dirname(subdir)
+
+    def merge(self, other):
+        # Folds in a worker's manifest; whatever it didn't produce out of the
+        # old entries it was handed is no longer ours to carry over
+        self.files.update(other.files)
+        for name in other.old.keys() - other.files.keys():
+            self.old.pop(name, None)
+        self.written += other.written
+        self.skipped += other.skipped
+        self.deleted += other.deleted
+        self.bytes_written += other.bytes_written
+
+    def save(self, prune=True):
+        # With prune=False (partial runs) entries we didn't regenerate are kept
+        if prune:
+            self.prune()
+        else:
+            for name, digest in self.old.items():
+                self.files.setdefault(name, digest)
+
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'files': self.files}, f, separators=(',', ':'), sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def summary(self):
+        return f'{self.written} written, {self.skipped} skipped, {self.deleted} deleted'
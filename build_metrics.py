@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# Progress reporting, metrics and opt-in profiling for the generators.
+#
+# Progress prints at most one line per interval (rate, ETA, bytes written,
+# errors) instead of a line per file, and can append the same numbers as JSON
+# lines to a metrics file. instrumented() wraps a whole run and, when asked,
+# profiles it with cProfile and/or tracemalloc, writing one file per run.
+import contextlib
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+
+def duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f'{seconds // 3600}h{seconds % 3600 // 60:02d}m'
+    if seconds >= 60:
+        return f'{seconds // 60}m{seconds % 60:02d}s'
+    return f'{seconds}s'
+
+
+class Progress:
+    def __init__(self, label, total, interval=2.0, metrics_path=None, stream=None):
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.stream = stream or sys.stdout
+        self.done = 0
+        self.bytes_written = 0
+        self.errors = 0
+        self.started = time.monotonic()
+        self._next = self.started + interval
+        self._metrics = open(metrics_path, 'a', encoding='utf-8') if metrics_path else None
+
+    def update(self, done, bytes_written=None, errors=None):
+        # Absolute counts; reports only once the interval has passed
+        self.done = done
+        if bytes_written is not None:
+            self.bytes_written = bytes_written
+        if errors is not None:
+            self.errors = errors
+        now = time.monotonic()
+        if now >= self._next:
+            self._next = now + self.interval
+            self._report(now)
+
+    def as_dict(self, now=None):
+        elapsed = (now or time.monotonic()) - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        remaining = self.total - self.done
+        return {
+            'label': self.label,
+            'done': self.done,
+            'total': self.total,
+            'elapsed': round(elapsed, 3),
+            'rate': round(rate, 1),
+            'eta': round(remaining / rate, 1) if rate else None,
+            'bytes_written': self.bytes_written,
+            'errors': self.errors,
+        }
+
+    def _report(self, now, final=False):
+        m = self.as_dict(now)
+        pct = f' ({m["done"] / m["total"]:.1%})' if m['total'] else ''
+        eta = '' if final or m['eta'] is None else f', ETA {duration(m["eta"])}'
+        print(f'{self.label}: {m["done"]:,}/{m["total"]:,}{pct}, {m["rate"]:,.0f}/s{eta}, '
+              f'{m["bytes_written"] / 1e6:,.1f} MB written, {m["errors"]} errors'
+              f'{" in " + duration(m["elapsed"]) if final else ""}', file=self.stream)
+        if self._metrics:
+            m['final'] = final
+            self._metrics.write(json.dumps(m) + '\n')
+            self._metrics.flush()
+
+    def finish(self):
+        self._report(time.monotonic(), final=True)
+        if self._metrics:
+            self._metrics.close()
+            self._metrics = None
+
+
+def add_arguments(parser):
+    parser.add_argument('--metrics-json', metavar='PATH',
+                        help='append progress and final metrics as JSON lines to PATH')
+    parser.add_argument('--profile', choices=['cpu', 'memory', 'all'],
+                        help='profile the run with cProfile (cpu) and/or tracemalloc (memory)')
+    parser.add_argument('--profile-dir', default='profiles',
+                        help='where profile files go (default: profiles)')
+
+
+@contextlib.contextmanager
+def instrumented(name, args):
+    # Wraps a generator run; args comes from a parser set up by add_arguments()
+    mode = getattr(args, 'profile', None)
+    if not mode:
+        yield
+        return
+
+    os.makedirs(args.profile_dir, exist_ok=True)
+    base = os.path.join(args.profile_dir, f'{name}-{time.strftime("%Y%m%d-%H%M%S")}')
+    profiler = cProfile.Profile() if mode in ('cpu', 'all') else None
+    if mode in ('memory', 'all'):
+        tracemalloc.start(25)
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(base + '.prof')
+            print(f'CPU profile written to {base}.prof')
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            with open(base + '.memory.txt', 'w', encoding='utf-8') as f:
+                f.write(f'current {current:,} bytes, peak {peak:,} bytes\n\n')
+                for stat in snapshot.statistics('lineno')[:50]:
+                    f.write(f'{stat}\n')
+            print(f'Memory profile written to {base}.memory.txt')
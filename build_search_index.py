@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# Build the static search index used by search.js on index.html.
+#
+# Every game in the catalogs (the cards on index.html, update_index.py,
+# generate_games.py and the million-game templates) is tokenised by name and
+# description. Tokens are sharded by their first two characters into
+# search/<prefix>.json, each holding the tokens in that prefix and the games
+# they point at, so a lookup fetches one small shard instead of a giant list.
+#
+# The million-game range is not listed game by game: each template becomes a
+# single "series" entry (first id, last id, step) the page expands itself.
+import argparse
+import json
+import os
+import re
+import sys
+from collections import defaultdict
+from html import unescape
+
+import generate_games
+import generate_million_games as million
+import update_index
+from build_manifest import Manifest
+
+CARD = re.compile(r'<a href="([^"]+)" class="game-card">\s*<div class="game-icon"[^>]*>(.*?)</div>'
+                  r'\s*<h3>(.*?)</h3>\s*<p>(.*?)</p>', re.S)
+WORD = re.compile(r'\w+')
+PREFIX_LEN = 2
+
+
+def tokens(text):
+    return {w for w in WORD.findall(text.lower()) if len(w) >= PREFIX_LEN}
+
+
+def shard_file(prefix):
+    # Plain prefixes are used as-is; anything else is hex-encoded UTF-8 so the
+    # name is safe on every filesystem (search.js does the same)
+    if re.fullmatch(r'[a-z0-9]+', prefix):
+        return f'{prefix}.json'
+    return f'x{prefix.encode("utf-8").hex()}.json'
+
+
+def catalog(index_html='index.html'):
+    # (doc, searchable text) for every game, first source wins per page
+    seen = set()
+
+    def add(url, name, icon, desc):
+        if url not in seen:
+            seen.add(url)
+            return [({'url': url, 'name': name, 'icon': icon, 'desc': desc}, f'{name} {desc}')]
+        return []
+
+    docs = []
+    if os.path.exists(index_html):
+        with open(index_html, 'r', encoding='utf-8') as f:
+            for url, icon, name, desc in CARD.findall(f.read()):
+                docs += add(url, unescape(name.strip()), unescape(icon.strip()), unescape(desc.strip()))
+    for name, icon, desc, file in update_index.games:
+        docs += add(f'{file}.html', name, icon, desc)
+    for i, (name, icon, desc, slug) in enumerate(generate_games.games, 2):
+        docs += add(f'game{i:02d}.html', name, icon, desc)
+
+    step = len(million.game_templates)
+    for index, (label, icon, desc) in enumerate(million.game_templates):
+        first = million.FIRST_GAME + (index - million.FIRST_GAME) % step
+        doc = {'url': 'game{n}.html', 'name': f'{label} Game {{n}}', 'icon': icon,
+               'desc': desc, 'series': [first, million.LAST_GAME, step]}
+        docs.append((doc, f'{label} game {desc}'))
+    return docs
+
+
+def build_shards(docs):
+    # prefix -> {'tokens': {token: [doc index]}, 'docs': [doc]}
+    postings = defaultdict(lambda: defaultdict(list))
+    for doc_id, (_, text) in enumerate(docs):
+        for token in sorted(tokens(text)):
+            postings[token[:PREFIX_LEN]][token].append(doc_id)
+
+    shards = {}
+    for prefix, by_token in postings.items():
+        local = {}
+        shard_tokens = {}
+        for token, doc_ids in sorted(by_token.items()):
+            shard_tokens[token] = [local.setdefault(d, len(local)) for d in doc_ids]
+        shards[prefix] = {'tokens': shard_tokens, 'docs': [docs[d][0] for d in local]}
+    return shards
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the sharded game search index.')
+    parser.add_argument('--index', default='index.html', help='page whose game cards are indexed')
+    parser.add_argument('--out', default='search', help='directory for the index shards')
+    args = parser.parse_args(argv)
+
+    docs = catalog(args.index)
+    shards = build_shards(docs)
+
+    os.makedirs(args.out, exist_ok=True)
+    manifest = Manifest(args.out, 'search_index')
+    for prefix, shard in sorted(shards.items()):
+        data = json.dumps(shard, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+        manifest.write(shard_file(prefix), data.encode('utf-8'))
+    manifest.save()
+
+    largest = max(len(json.dumps(s, ensure_ascii=False)) for s in shards.values())
+    print(f'Indexed {len(docs)} entries into {len(shards)} shards '
+          f'(largest ~{largest:,} bytes). Files: {manifest.summary()}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# Service worker and precache manifest for the site's shared files.
+#
+# precache-manifest.json lists index.html, style.css, gameManager.js, the
+# classic game pages and scripts and the million-range shared runtime and
+# stylesheet (whichever exist), each with its content hash; hashed copies
+# from hash_assets.py are listed under their hashed names. sw.js carries a
+# version derived from the manifest, so any changed file makes browsers
+# install the new worker, which precaches the list and drops the old cache.
+#
+# At runtime the worker serves content-hashed files (assets/*.<hash>.*,
+# runtime-<hash>.js, game-<hash>.css) cache-first, since their URL changes
+# with their content, and precached files stale-while-revalidate. Only those
+# are ever cached: the hashed files in a runtime cache versioned like the
+# precache (so a new worker drops both), and anything else, the million-range
+# pages included, goes to the network untouched rather than filling the
+# browser's storage a page at a time. Only files whose size or mtime changed since the
+# last run are hashed again, and sw.js/the manifest are only rewritten when
+# their bytes change. Range requests (the parameter table) go straight to the
+# network, since a partial response can't stand in for the file. index.html
+# only registers the worker once this has written it: the registration lives
+# in the page's service-worker section. Run it after the generators and
+# hash_assets.py:
+#
+#     python3 build_service_worker.py --out .
+import argparse
+import json
+import os
+import sys
+
+from assemble_index import MarkerError, assemble, update_block
+from build_manifest import Manifest, content_hash
+from hash_assets import REVALIDATE, load_map
+
+SW_NAME = 'sw.js'
+PRECACHE_NAME = 'precache-manifest.json'
+STATE_NAME = '.precache-state.json'
+MANIFEST_NAME = 'build_service_worker'
+
+FIRST_CLASSIC = 1
+LAST_CLASSIC = 103
+SHARED = ['index.html', 'style.css', 'gameManager.js']
+
+SW_JS = '''// Generated by build_service_worker.py; do not edit.
+const VERSION = '{version}';
+const PRECACHE = `precache-${{VERSION}}`;
+const RUNTIME = `runtime-${{VERSION}}`;
+// Content-hashed names: a URL never changes its bytes
+const HASHED = /(^|\\/)(assets\\/.+\\.[0-9a-f]{{12}}\\.\\w+|runtime-[0-9a-f]{{12}}\\.js|game-[0-9a-f]{{12}}\\.css)$/;
+
+self.addEventListener('install', event => {{
+    event.waitUntil((async () => {{
+        const manifest = await (await fetch(`{precache}?v=${{VERSION}}`, {{cache: 'no-store'}})).json();
+        const cache = await caches.open(PRECACHE);
+        await cache.addAll(Object.keys(manifest.files).map(url => new Request(url, {{cache: 'reload'}})));
+        await self.skipWaiting();
+    }})());
+}});
+
+self.addEventListener('activate', event => {{
+    event.waitUntil((async () => {{
+        // Older workers' caches, including the unversioned 'runtime' of the
+        // first ones
+        for (const name of await caches.keys()) {{
+            if (name !== PRECACHE && name !== RUNTIME &&
+                (name.startsWith('precache-') || name.startsWith('runtime'))) await caches.delete(name);
+        }}
+        await self.clients.claim();
+    }})());
+}});
+
+async function cacheFirst(request) {{
+    const copy = await caches.match(request);
+    if (copy) return copy;
+    const response = await fetch(request);
+    if (response.status === 200) (await caches.open(RUNTIME)).put(request, response.clone());
+    return response;
+}}
+
+async function cached(request) {{
+    const url = new URL(request.url);
+    const precache = await caches.open(PRECACHE);
+    // "/" is precached as "index.html"
+    return await precache.match(request)
+        || (url.pathname.endsWith('/') ? await precache.match(url.pathname + 'index.html') : undefined);
+}}
+
+async function staleWhileRevalidate(event, copy) {{
+    // copy is the precached response; the fresh one replaces it
+    const refresh = fetch(event.request).then(async response => {{
+        if (response.status === 200) await (await caches.open(PRECACHE)).put(event.request, response.clone());
+        return response;
+    }});
+    event.waitUntil(refresh.catch(() => {{}}));
+    return copy;
+}}
+
+self.addEventListener('fetch', event => {{
+    const url = new URL(event.request.url);
+    if (event.request.method !== 'GET' || url.origin !== self.location.origin) return;
+    // Partial responses (206) are the browser's to handle, never cached
+    if (event.request.headers.has('range')) return;
+    if (HASHED.test(url.pathname)) {{
+        event.respondWith(cacheFirst(event.request));
+        return;
+    }}
+    // Anything not precached is left to the network
+    event.respondWith(cached(event.request).then(copy => copy
+        ? staleWhileRevalidate(event, copy) : fetch(event.request)));
+}});
+'''
+
+
+def precache_names(root='.'):
+    # Site paths to precache, in a stable order; hashed copies where
+    # hash_assets.py made them, and only files that exist
+    import generate_million_games as million
+
+    assets = load_map(root)
+    names = [assets.get(name, name) for name in SHARED]
+    for i in range(FIRST_CLASSIC, LAST_CLASSIC + 1):
+        names.append(f'game{i:02d}.html')
+        names.append(assets.get(f'game{i:02d}.js', f'game{i:02d}.js'))
+    names += sorted({million.runtime(False)[0], million.runtime(True)[0]})
+    names.append(million.GAME_CSS_NAME)
+    return [name for name in dict.fromkeys(names) if os.path.isfile(os.path.join(root, name))]
+
+
+def load_state(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)['files']
+    except FileNotFoundError:
+        return {}
+    except (ValueError, KeyError):
+        print(f'Ignoring unreadable precache state {path}')
+        return {}
+
+
+def hash_files(root, names, old):
+    # ({name: [size, mtime_ns, hash]}, files hashed); a file whose size and
+    # mtime match the last run keeps its recorded hash
+    state = {}
+    hashed = 0
+    for name in names:
+        st = os.stat(os.path.join(root, name))
+        entry = old.get(name)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            state[name] = entry
+            continue
+        with open(os.path.join(root, name), 'rb') as f:
+            state[name] = [st.st_size, st.st_mtime_ns, content_hash(f.read())]
+        hashed += 1
+    return state, hashed
+
+
+def build(root='.'):
+    # Returns (files listed, files hashed, outputs written)
+    state_path = os.path.join(root, STATE_NAME)
+    state, hashed = hash_files(root, precache_names(root), load_state(state_path))
+
+    files = {name: entry[2] for name, entry in state.items()}
+    manifest_json = json.dumps({'version': 1, 'files': files}, indent=1).encode() + b'\n'
+    version = content_hash(manifest_json)[:12]
+    sw = SW_JS.format(version=version, precache=PRECACHE_NAME).encode()
+
+    manifest = Manifest(root, MANIFEST_NAME)
+    written = sum([manifest.write(PRECACHE_NAME, manifest_json), manifest.write(SW_NAME, sw)])
+    manifest.save()
+
+    tmp = state_path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'version': 1, 'files': state}, f, separators=(',', ':'), sort_keys=True)
+    os.replace(tmp, state_path)
+    return len(files), hashed, written
+
+
+def registration_lines():
+    # index.html's service-worker section
+    yield '    <script>'
+    yield f'        // Precached shared files and offline play ({SW_NAME} is written by ' \
+          'build_service_worker.py)'
+    yield "        if ('serviceWorker' in navigator) {"
+    yield "            window.addEventListener('load', () => " \
+          f"navigator.serviceWorker.register('{SW_NAME}').catch(() => {{}}));"
+    yield '        }'
+    yield '    </script>'
+
+
+def header_lines():
+    # The worker and its list must never be served stale from a cache
+    for path in (f'/{SW_NAME}', f'/{PRECACHE_NAME}'):
+        yield path
+        yield f'  Cache-Control: {REVALIDATE}'
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(description='Write the service worker and its precache '
+                                                 'manifest.', prog=prog)
+    parser.add_argument('--out', default='.', help='site directory')
+    args = parser.parse_args(argv)
+
+    # The page is precached too, so it is registered first
+    index = os.path.join(args.out, 'index.html')
+    try:
+        if assemble(index, {'service-worker': registration_lines}):
+            print(f'Registered {SW_NAME} in {index}')
+    except (MarkerError, OSError) as e:
+        print(f'Error: cannot register {SW_NAME} in {index}: {getattr(e, "strerror", None) or e}')
+        return 1
+    count, hashed, written = build(args.out)
+    if update_block(os.path.join(args.out, '_headers'), 'service-worker', header_lines):
+        print('Updated _headers')
+    print(f'{PRECACHE_NAME}: {count} files ({hashed} rehashed); '
+          f'{SW_NAME} {"updated" if written else "unchanged"}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# Sitemaps for the million-game range.
+#
+# Writes sitemaps/games-NNNN.xml (optionally .xml.gz), each listing at most
+# 50,000 game pages (the sitemaps.org limit), and a sitemap.xml index that
+# points at them. URLs come from generate_million_games.game_files(), so they
+# follow the layout the range was generated with. Chunks are streamed
+# straight to disk, one URL at a time, so memory stays flat however large
+# the range.
+#
+# Chunk k always starts at game FIRST_GAME + k * chunk size, so growing the
+# range (--end) only rewrites the last, partial chunk and adds new ones; a
+# chunk whose recipe (range, base URL, layout, compression) hasn't changed
+# is left alone and keeps its <lastmod>.
+import argparse
+import gzip
+import io
+import json
+import os
+import sys
+import time
+from xml.sax.saxutils import escape
+
+import generate_million_games as million
+
+CHUNK_SIZE = 50000
+SITEMAP_DIR = 'sitemaps'
+INDEX_NAME = 'sitemap.xml'
+STATE_NAME = '.sitemap-state.json'
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+URLSET = '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+SITEMAPINDEX = '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+
+
+def chunks(end, chunk_size=CHUNK_SIZE):
+    # (chunk number, first game, stop) covering FIRST_GAME..end-1
+    for k, first in enumerate(range(million.FIRST_GAME, end, chunk_size)):
+        yield k, first, min(first + chunk_size, end)
+
+
+def chunk_name(k, compress=False):
+    return f'{SITEMAP_DIR}/games-{k:04d}.xml{".gz" if compress else ""}'
+
+
+def url_lines(base_url, first, stop, layout='flat'):
+    prefix = f'<url><loc>{escape(base_url)}/'
+    for i in range(first, stop):
+        yield f'{prefix}{million.game_files(i, layout)[0]}</loc></url>\n'
+
+
+def write_stream(path, parts, compress=False):
+    # Writes the parts as they come, to a temp file renamed into place
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = path + '.tmp'
+    try:
+        with open(tmp, 'wb') as raw:
+            # mtime=0 keeps gzip output identical between runs
+            stream = gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) if compress else raw
+            with io.TextIOWrapper(stream, encoding='utf-8', newline='\n') as f:
+                f.writelines(parts)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def write_chunk(path, base_url, first, stop, layout='flat', compress=False):
+    write_stream(path, _chunk_parts(base_url, first, stop, layout), compress)
+
+
+def _chunk_parts(base_url, first, stop, layout):
+    yield XML_HEADER
+    yield URLSET
+    yield from url_lines(base_url, first, stop, layout)
+    yield '</urlset>\n'
+
+
+def load_state(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)['chunks']
+    except FileNotFoundError:
+        return {}
+    except (ValueError, KeyError):
+        print(f'Ignoring unreadable sitemap state {path}')
+        return {}
+
+
+def build_sitemaps(out_dir, base_url, end=million.LAST_GAME + 1, layout='flat',
+                   compress=False, chunk_size=CHUNK_SIZE):
+    # Returns (chunks written, chunks unchanged)
+    base_url = base_url.rstrip('/')
+    state_path = os.path.join(out_dir, STATE_NAME)
+    old = load_state(state_path)
+    state = {}
+    written = unchanged = 0
+    today = time.strftime('%Y-%m-%d', time.gmtime())
+    for k, first, stop in chunks(end, chunk_size):
+        name = chunk_name(k, compress)
+        recipe = {'base_url': base_url, 'layout': layout, 'first': first, 'stop': stop}
+        previous = old.get(name)
+        if (previous and previous['recipe'] == recipe
+                and os.path.exists(os.path.join(out_dir, name))):
+            state[name] = previous
+            unchanged += 1
+            continue
+        write_chunk(os.path.join(out_dir, name), base_url, first, stop, layout, compress)
+        state[name] = {'recipe': recipe, 'lastmod': today}
+        written += 1
+
+    # Chunks the range no longer has (or written with the other compression)
+    for name in old.keys() - state.keys():
+        try:
+            os.remove(os.path.join(out_dir, name))
+        except FileNotFoundError:
+            pass
+
+    write_stream(os.path.join(out_dir, INDEX_NAME), _index_parts(base_url, state))
+    tmp = state_path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'version': 1, 'chunks': state}, f, indent=1, sort_keys=True)
+    os.replace(tmp, state_path)
+    return written, unchanged
+
+
+def _index_parts(base_url, state):
+    yield XML_HEADER
+    yield SITEMAPINDEX
+    for name in sorted(state):
+        yield (f'<sitemap><loc>{escape(base_url)}/{name}</loc>'
+               f'<lastmod>{state[name]["lastmod"]}</lastmod></sitemap>\n')
+    yield '</sitemapindex>\n'
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(description='Write sitemaps for the million-game range.',
+                                     prog=prog)
+    parser.add_argument('--base-url', required=True,
+                        help='site URL the sitemap links are built on, e.g. https://example.netlify.app')
+    parser.add_argument('--out', default='.', help='site directory')
+    parser.add_argument('--end', type=int, default=million.LAST_GAME,
+                        help=f'last game number, inclusive (default: {million.LAST_GAME})')
+    parser.add_argument('--layout', choices=sorted(million.LAYOUTS), default='flat',
+                        help='layout the range was generated with')
+    parser.add_argument('--gzip', action='store_true', help='write .xml.gz sitemaps')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help=f'URLs per sitemap, at most {CHUNK_SIZE} (default: {CHUNK_SIZE})')
+    args = parser.parse_args(argv)
+    if not 0 < args.chunk_size <= CHUNK_SIZE:
+        parser.error(f'--chunk-size must be between 1 and {CHUNK_SIZE}')
+
+    written, unchanged = build_sitemaps(args.out, args.base_url, args.end + 1, args.layout,
+                                        args.gzip, args.chunk_size)
+    print(f'{INDEX_NAME}: {written + unchanged} sitemaps ({written} written, '
+          f'{unchanged} unchanged) for games {million.FIRST_GAME}-{args.end}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
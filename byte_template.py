@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# Precompiled byte templates for the page generators.
+#
+# A template uses str.format syntax ({slot}, with {{ and }} for literal braces)
+# and is compiled once into pre-encoded static byte segments plus slots.
+# Rendering just drops the slot values (bytes) between the segments and joins
+# them, so there's no per-page string formatting or encoding.
+from string import Formatter
+
+
+class Template:
+    def __init__(self, source, encoding='utf-8'):
+        self.encoding = encoding
+        parts = []
+        static = []
+        for literal, field, spec, conversion in Formatter().parse(source):
+            static.append(literal)
+            if field is None:
+                continue
+            if not field.isidentifier() or spec or conversion:
+                raise ValueError(f'unsupported template field {{{field}}}')
+            parts.append(''.join(static).encode(encoding))
+            parts.append(field)
+            static = []
+        parts.append(''.join(static).encode(encoding))
+        self._compile(parts)
+
+    def _compile(self, parts):
+        # parts alternates static bytes and slot names (str), starting and
+        # ending with a static segment
+        self._parts = parts
+        self._slots = [(index, part) for index, part in enumerate(parts) if isinstance(part, str)]
+        self.slots = tuple(dict.fromkeys(name for _, name in self._slots))
+        # With a single distinct slot (e.g. just the game number) rendering is
+        # one bytes.join over the static segments
+        self._single = self.slots[0] if len(self.slots) == 1 else None
+        self._statics = parts[::2]
+
+    def bind(self, **values):
+        # Returns a new template with some slots filled in for good, for values
+        # that are shared by many pages (template name, icon, ...)
+        parts = [self._parts[0]]
+        for index in range(1, len(self._parts), 2):
+            name = self._parts[index]
+            static = self._parts[index + 1]
+            if name in values:
+                value = values[name]
+                if isinstance(value, str):
+                    value = value.encode(self.encoding)
+                parts[-1] += value + static
+            else:
+                parts += [name, static]
+        bound = Template.__new__(Template)
+        bound.encoding = self.encoding
+        bound._compile(parts)
+        return bound
+
+    def render(self, **values):
+        if self._single is not None:
+            return values[self._single].join(self._statics)
+        parts = self._parts.copy()
+        for index, name in self._slots:
+            parts[index] = values[name]
+        return b''.join(parts)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# Durable record of finished shards, so a long run can resume after a crash.
+#
+# The checkpoint is a JSON-lines file next to the manifest: a header line with
+# the run's parameters, then one line per shard that finished without errors,
+# carrying that shard's manifest entries. Each line is fsynced before the run
+# moves on, and a torn last line (the process died mid-append) is ignored on
+# load. The file is removed once the run completes.
+import json
+import os
+
+from build_manifest import content_hash
+
+# Outputs re-read per finished shard on resume, newest first
+VERIFY_TAIL = 20
+
+
+class CheckpointError(Exception):
+    pass
+
+
+class Checkpoint:
+    def __init__(self, out_dir, name):
+        self.out_dir = out_dir
+        self.path = os.path.join(out_dir, f'.checkpoint-{name}.jsonl')
+        self._f = None
+
+    def start(self, params):
+        # Begins a fresh checkpoint, discarding any earlier one
+        self._f = open(self.path, 'w', encoding='utf-8')
+        self._f.write(json.dumps({'params': params}) + '\n')
+        self._sync()
+
+    def resume(self, params):
+        # Returns {(start, end, step): files} for the shards a previous run
+        # with the same params finished, and keeps appending to the same file
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.read().split('\n')
+        except FileNotFoundError:
+            raise CheckpointError(f'no checkpoint at {self.path}') from None
+        try:
+            header = json.loads(lines[0])['params']
+        except (ValueError, KeyError):
+            raise CheckpointError(f'unreadable checkpoint {self.path}') from None
+        if header != params:
+            changed = ', '.join(sorted(k for k in params.keys() | header.keys()
+                                       if params.get(k) != header.get(k)))
+            raise CheckpointError(f'checkpoint was written with different options ({changed})')
+
+        done = {}
+        for line in lines[1:]:
+            try:
+                shard = json.loads(line)
+            except ValueError:
+                # Torn final append; everything before it is intact
+                break
+            done[shard['start'], shard['end'], shard['step']] = shard['files']
+
+        # Rewrite without any torn tail before appending to it again
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'params': params}) + '\n')
+            for shard, files in done.items():
+                self._write_shard(f, shard, files)
+        os.replace(tmp, self.path)
+        self._f = open(self.path, 'a', encoding='utf-8')
+        return done
+
+    def verify(self, files):
+        # Re-reads the last few outputs a shard recorded; False if any is
+        # missing or differs (e.g. lost in a power cut after the checkpoint)
+        for name, digest in list(files.items())[-VERIFY_TAIL:]:
+            try:
+                with open(os.path.join(self.out_dir, name), 'rb') as f:
+                    if content_hash(f.read()) != digest:
+                        return False
+            except FileNotFoundError:
+                return False
+        return True
+
+    def record(self, shard, files):
+        self._write_shard(self._f, shard, files)
+        self._sync()
+
+    @staticmethod
+    def _write_shard(f, shard, files):
+        start, end, step = shard
+        f.write(json.dumps({'start': start, 'end': end, 'step': step, 'files': files}) + '\n')
+
+    def _sync(self):
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def remove(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        if self._f:
+            self._f.close()
+            self._f = None
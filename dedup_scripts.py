@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# Find byte-identical page scripts and point their pages at one shared copy.
+#
+# Every copy of a script is a separate download and cache entry. This pass
+# groups the local scripts referenced by hand-written *.html pages by content
+# hash, writes each duplicated script once as shared-<hash>.js and rewrites
+# the <script src> of every page that used a copy. With --delete the
+# now-unreferenced copies are removed: a copy goes only once no page in the
+# site, generated ones included, still loads it. Pages and shared copies are
+# written to a temporary file and renamed into place, so an interrupted run
+# never leaves a half-written one.
+#
+# The gameN.html pages belong to the generators, which would put their own
+# links back on the next run, so this pass doesn't rewrite them; the generators
+# share scripts themselves through shared_name() and relink() (fix_all_games.py
+# writes its one stub once for all the games that get it).
+import argparse
+import os
+import re
+import sys
+from collections import defaultdict
+
+from build_manifest import content_hash
+
+SCRIPT_SRC = re.compile(rb'<script src="([^":/]+\.js)"></script>')
+# relink() also follows links into assets/ (hash_assets.py copies)
+LINKED_SRC = re.compile(rb'<script src="([^":]+\.js)"></script>')
+GENERATED_PAGE = re.compile(r'^game\d+\.html$')
+SKIP_DIRS = {'.git', '__pycache__', 'node_modules'}
+
+
+def shared_name(data):
+    # Content-addressed name for a script several pages load
+    return f'shared-{content_hash(data)[:12]}.js'
+
+
+def relink(path, old, new, dry_run=False):
+    # Points a page's <script src> for any of the names in old at new;
+    # returns whether the page changed (False if there is no such page)
+    try:
+        with open(path, 'rb') as f:
+            html = f.read()
+    except FileNotFoundError:
+        return False
+    old = {name.encode('utf-8') for name in old}
+    new = new.encode('utf-8')
+    rewritten = LINKED_SRC.sub(lambda m: m.group(0).replace(m.group(1), new)
+                               if m.group(1) in old else m.group(0), html)
+    if rewritten == html or dry_run:
+        return rewritten != html
+    _write(path, rewritten)
+    return True
+
+
+def _write(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def find_pages(out_dir):
+    # page name -> local scripts it loads, for the pages no generator owns
+    pages = {}
+    with os.scandir(out_dir) as entries:
+        for entry in entries:
+            if (entry.name.endswith('.html') and not GENERATED_PAGE.match(entry.name)
+                    and entry.is_file()):
+                with open(entry.path, 'rb') as f:
+                    pages[entry.name] = SCRIPT_SRC.findall(f.read())
+    return pages
+
+
+def referenced_scripts(out_dir):
+    # Site paths of the local scripts any page loads, generated pages and
+    # pages in subdirectories included; each src is resolved against its page
+    used = set()
+    stack = ['']
+    while stack:
+        subdir = stack.pop()
+        with os.scandir(os.path.join(out_dir, subdir)) as entries:
+            for entry in entries:
+                name = os.path.join(subdir, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIP_DIRS and not entry.name.startswith('.'):
+                        stack.append(name)
+                elif entry.name.endswith('.html'):
+                    with open(entry.path, 'rb') as f:
+                        for src in LINKED_SRC.findall(f.read()):
+                            used.add(os.path.normpath(os.path.join(subdir, src.decode('utf-8'))))
+    return used
+
+
+def group_scripts(out_dir, pages):
+    # content hash -> script names, for scripts that exist on disk
+    groups = defaultdict(set)
+    for scripts in pages.values():
+        for script in scripts:
+            name = script.decode('utf-8')
+            try:
+                with open(os.path.join(out_dir, name), 'rb') as f:
+                    groups[content_hash(f.read())].add(name)
+            except FileNotFoundError:
+                pass
+    return {digest: sorted(names) for digest, names in groups.items()
+            if len(names) > 1 and not names & {f'shared-{digest[:12]}.js'}}
+
+
+def dedup(out_dir='.', delete=False, dry_run=False):
+    pages = find_pages(out_dir)
+    groups = group_scripts(out_dir, pages)
+
+    # old script name -> shared script name
+    shared_for = {}
+    saved = 0
+    for digest, names in sorted(groups.items()):
+        shared = f'shared-{digest[:12]}.js'
+        size = os.path.getsize(os.path.join(out_dir, names[0]))
+        print(f'{shared}: {len(names)} copies ({", ".join(names[:5])}{", ..." if len(names) > 5 else ""})')
+        saved += size * (len(names) - 1)
+        for name in names:
+            shared_for[name.encode('utf-8')] = shared.encode('utf-8')
+        if not dry_run:
+            with open(os.path.join(out_dir, names[0]), 'rb') as src:
+                _write(os.path.join(out_dir, shared), src.read())
+
+    rewritten = 0
+    for page, scripts in sorted(pages.items()):
+        if not any(s in shared_for for s in scripts):
+            continue
+        rewritten += 1
+        if dry_run:
+            continue
+        path = os.path.join(out_dir, page)
+        with open(path, 'rb') as f:
+            html = f.read()
+        _write(path, SCRIPT_SRC.sub(lambda m: m.group(0).replace(
+            m.group(1), shared_for.get(m.group(1), m.group(1))), html))
+
+    deleted = 0
+    if delete and shared_for and not dry_run:
+        still_used = referenced_scripts(out_dir)
+        for name in shared_for:
+            name = name.decode('utf-8')
+            if name not in still_used:
+                os.remove(os.path.join(out_dir, name))
+                deleted += 1
+
+    prefix = 'Would rewrite' if dry_run else 'Rewrote'
+    print(f'{prefix} {rewritten} pages to use {len(groups)} shared scripts, '
+          f'{deleted} duplicates deleted, {saved:,} bytes of duplicate script')
+    return rewritten
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Point pages with identical scripts at one shared copy.')
+    parser.add_argument('--out', default='.', help='site directory to scan')
+    parser.add_argument('--delete', action='store_true',
+                        help='remove duplicate scripts no page references any more')
+    parser.add_argument('--dry-run', action='store_true', help='only report what would change')
+    args = parser.parse_args(argv)
+    dedup(args.out, delete=args.delete, dry_run=args.dry_run)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
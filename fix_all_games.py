@@ -1,5 +1,16 @@
 #!/usr/bin/env python3
+import argparse
 import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import build_metrics
+import generate_games
+import selection
+from build_manifest import Manifest, content_hash
+from dedup_scripts import relink, shared_name
+from hash_assets import asset_url, load_map, refresh_copy, save_map
 
 # Game implementations
 games = {
@@ -320,108 +331,293 @@ function gameLoop() {
 gameLoop();'''
 }
 
-# Fix all remaining games with simple click-to-score games
-for i in range(1, 104):
-    num = f"{i:02d}"
-    filename = f'game{num}.js'
-    
-    # Skip games we already fixed
-    if filename in ['game01.js', 'game02.js', 'game03.js', 'game04.js', 'game05.js', 
-                     'game06.js', 'game07.js', 'game09.js', 'game10.js', 'game11.js', 
-                     'game20.js', 'game30.js']:
-        continue
-    
-    # Create a simple interactive game
-    game_code = f'''// Interactive Game
+# Simple click-to-score game written over every remaining stub
+STUB_GAME = '''// Interactive Game
 const canvas = document.getElementById('gameCanvas');
 const ctx = canvas.getContext('2d');
 let score = 0;
 const targets = [];
 let gameStarted = false;
 
-function createTarget() {{
-    targets.push({{
+function createTarget() {
+    targets.push({
         x: Math.random() * (canvas.width - 40),
         y: Math.random() * (canvas.height - 40),
         width: 40,
         height: 40,
         active: true,
-        color: `hsl(${{Math.random() * 360}}, 70%, 50%)`
-    }});
-}}
+        color: `hsl(${Math.random() * 360}, 70%, 50%)`
+    });
+}
 
-canvas.addEventListener('click', (e) => {{
-    if (!gameStarted) {{
+canvas.addEventListener('click', (e) => {
+    if (!gameStarted) {
         gameStarted = true;
         for (let i = 0; i < 5; i++) createTarget();
         return;
-    }}
+    }
     
     const rect = canvas.getBoundingClientRect();
     const x = e.clientX - rect.left;
     const y = e.clientY - rect.top;
     
-    targets.forEach((target, index) => {{
+    targets.forEach((target, index) => {
         if (target.active && x >= target.x && x <= target.x + target.width &&
-            y >= target.y && y <= target.y + target.height) {{
+            y >= target.y && y <= target.y + target.height) {
             target.active = false;
             targets.splice(index, 1);
             score += 10;
             document.getElementById('score').textContent = score;
             createTarget();
-        }}
-    }});
-}});
+        }
+    });
+});
 
-function update() {{
+function update() {
     if (!gameStarted) return;
     
-    targets.forEach(target => {{
+    targets.forEach(target => {
         target.x += (Math.random() - 0.5) * 2;
         target.y += (Math.random() - 0.5) * 2;
         target.x = Math.max(0, Math.min(canvas.width - target.width, target.x));
         target.y = Math.max(0, Math.min(canvas.height - target.height, target.y));
-    }});
-}}
+    });
+}
 
-function draw() {{
+function draw() {
     ctx.fillStyle = '#000';
     ctx.fillRect(0, 0, canvas.width, canvas.height);
     
-    if (!gameStarted) {{
+    if (!gameStarted) {
         ctx.fillStyle = '#fff';
         ctx.font = '30px Arial';
         ctx.textAlign = 'center';
         ctx.fillText('Click to Start!', canvas.width/2, canvas.height/2);
         return;
-    }}
+    }
     
-    targets.forEach(target => {{
-        if (target.active) {{
+    targets.forEach(target => {
+        if (target.active) {
             ctx.fillStyle = target.color;
             ctx.fillRect(target.x, target.y, target.width, target.height);
-        }}
-    }});
-}}
+        }
+    });
+}
 
-function gameLoop() {{
+function gameLoop() {
     update();
     draw();
     requestAnimationFrame(gameLoop);
-}}
+}
 gameLoop();
 '''
 
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write(game_code)
-    print(f'Fixed {filename}')
+# Scripts are numbered game01-game103
+FIRST_GAME = 1
+LAST_GAME = 103
+
+
+def planned_script(i):
+    # (filename, source) game i gets: its special game, or else the stub
+    game_id = f'game{i:02d}'
+    return f'{game_id}.js', games.get(game_id, STUB_GAME)
+
+
+# Every game without a special script gets the same stub, so it is written
+# once under a content-addressed name and their pages load that copy
+STUB_NAME = shared_name(STUB_GAME.encode('utf-8'))
+
+
+def published_name(i):
+    # The script game i's page loads once this script has run
+    filename, source = planned_script(i)
+    return STUB_NAME if source is STUB_GAME else filename
+
+
+# Structural signature of a script: comments, string literals and numbers
+# blanked out and whitespace collapsed, so every page generate_games.py
+# stamps out from one template shares a signature whatever its name/number
+COMMENT = re.compile(rb'^[ \t]*//[^\n]*', re.M)
+STRING = re.compile(rb"'(?:[^'\\\n]|\\.)*'|\"(?:[^\"\\\n]|\\.)*\"|`(?:[^`\\]|\\.)*`")
+NUMBER = re.compile(rb'\b\d+(?:\.\d+)?\b')
+
+
+def signature(data):
+    data = NUMBER.sub(b'0', STRING.sub(b"''", COMMENT.sub(b'', data)))
+    return content_hash(b' '.join(data.split()))
+
+
+# Scripts that are ours to replace: the placeholder generate_games.py writes
+# and the stub this script writes. Anything else is a hand-written game.
+STUB = STUB_GAME.encode('utf-8')
+STUB_SIGNATURES = {
+    signature(generate_games.render_game(0, 'Game', '', '')[1]),
+    signature(STUB),
+}
+
+
+def classify(path, planned):
+    # 'missing', 'current' (already the planned bytes), 'stub' (a known
+    # generated script) or 'hand-edited'
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return 'missing'
+    if data == planned:
+        return 'current'
+    if signature(data) in STUB_SIGNATURES:
+        return 'stub'
+    return 'hand-edited'
+
+
+def template_name(source):
+    # "stub" for the click-to-score stub, else the game's title comment
+    # (e.g. "Bubble Shooter")
+    return 'stub' if source is STUB_GAME else source.split('\n', 1)[0].lstrip('/ ')
+
+
+def planned_files(args=None):
+    # (filename, contents) for everything this script writes, or for the
+    # games the selection options in args pick
+    if args is None:
+        selected, template = [range(FIRST_GAME, LAST_GAME + 1)], None
+    else:
+        selected = selection.ranges(args, FIRST_GAME, LAST_GAME)
+        template = args.template.lower() if args.template else None
+    for r in selected:
+        for i in r:
+            planned = planned_script(i)
+            if template in (None, template_name(planned[1]).lower()):
+                yield planned[0], planned[1].encode('utf-8')
+
+
+def page_name(filename):
+    return filename[:-len('.js')] + '.html'
+
+
+def share_stub(out_dir, filename, dry_run=False, copies=None):
+    # Points a stub game's page at STUB_NAME (or its hashed copy in copies)
+    # and drops its own copy of the stub (or the generate_games.py
+    # placeholder); a hand-edited script stays
+    copies = copies or {}
+    path = os.path.join(out_dir, filename)
+    status = classify(path, STUB)
+    if status == 'hand-edited':
+        return status
+    page = os.path.join(out_dir, page_name(filename))
+    relinked = relink(page, [filename, asset_url(filename, copies)],
+                      asset_url(STUB_NAME, copies), dry_run)
+    if status == 'missing':
+        return 'missing' if relinked else 'current'
+    if not dry_run:
+        os.remove(path)
+    return 'stub'
+
+
+def patch_batch(out_dir, old, files, dry_run=False, copies=None):
+    # Classifies and patches one batch of (filename, contents) in a worker.
+    # copies is the slice of the site's asset map (hash_assets.py) for the
+    # batch; a script with a hashed copy gets a copy of its new bytes and
+    # its page is pointed at it. Returns the batch's manifest,
+    # [(filename, status)] and the updated copies.
+    manifest = Manifest(out_dir, 'fix_all_games', old=old)
+    copies = dict(copies or {})
+    report = []
+    for filename, data in files:
+        if data == STUB:
+            report.append((filename, share_stub(out_dir, filename, dry_run, copies)))
+            continue
+        status = classify(os.path.join(out_dir, filename), data)
+        if status == 'current':
+            manifest.keep(filename, data)
+        elif status != 'hand-edited' and not dry_run:
+            # The file on disk differs whatever the old manifest says
+            manifest.old.pop(filename, None)
+            manifest.write(filename, data)
+        if status != 'hand-edited' and filename in copies and not dry_run:
+            copy = copies[filename]
+            relink(os.path.join(out_dir, page_name(filename)), [filename, copy],
+                   refresh_copy(manifest, copies, filename, data))
+        report.append((filename, status))
+    return manifest, report, copies
+
+
+ACTIONS = {
+    'missing': ('created', 'would create'),
+    'stub': ('patched', 'would patch'),
+    'current': ('up to date', 'up to date'),
+    'hand-edited': ('left alone (hand-edited)', 'would leave alone (hand-edited)'),
+}
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(description='Replace placeholder game scripts with playable ones.',
+                                     prog=prog)
+    parser.add_argument('out', nargs='?', default='.', help='output directory')
+    parser.add_argument('--out', dest='out_dir', help='output directory (same as the positional)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='report what would change without writing anything')
+    parser.add_argument('-j', '--workers', type=int, default=0,
+                        help='worker processes (default: every core)')
+    parser.add_argument('--batch-size', type=int, default=25)
+    selection.add_arguments(parser, FIRST_GAME, LAST_GAME)
+    build_metrics.add_arguments(parser)
+    args = parser.parse_args(argv)
+    out = args.out_dir or args.out
+
+    with build_metrics.instrumented('fix_all_games', args):
+        # Only scripts that still carry a generated stub's signature are
+        # replaced; hand-written games are reported and never touched
+        manifest = Manifest(out, 'fix_all_games')
+        assets = load_map(out)
+        files = list(planned_files(args))
+        if not args.dry_run and any(data == STUB for _, data in files):
+            # In place before any page is pointed at it
+            manifest.write(STUB_NAME, STUB)
+        batches = [files[i:i + args.batch_size] for i in range(0, len(files), args.batch_size)]
+        progress = build_metrics.Progress('Scripts', len(files), metrics_path=args.metrics_json)
+        report = []
+        with ProcessPoolExecutor(max_workers=args.workers or None) as pool:
+            futures = []
+            for batch in batches:
+                # The batch's hashed copies, and their old hashes, go along
+                batch_copies = {name: assets[name] for name, _ in batch + [(STUB_NAME, STUB)]
+                                if name in assets}
+                futures.append(pool.submit(patch_batch, out,
+                                           manifest.subset([name for name, _ in batch] +
+                                                           list(batch_copies.values())),
+                                           batch, args.dry_run, batch_copies))
+            copies = {}
+            for future in futures:
+                batch_manifest, batch_report, batch_copies = future.result()
+                manifest.merge(batch_manifest)
+                report.extend(batch_report)
+                copies.update(batch_copies)
+                progress.update(len(report), manifest.bytes_written)
+        progress.finish()
+
+        action = 1 if args.dry_run else 0
+        for status, names in ((s, [n for n, st in report if st == s]) for s in ACTIONS):
+            if names:
+                shown = ', '.join(names[:12]) + (', ...' if len(names) > 12 else '')
+                print(f'{ACTIONS[status][action]}: {len(names)} ({shown})')
+        if args.dry_run:
+            return 0
 
-# Write special games
-for game_id, code in games.items():
-    filename = f'{game_id}.js'
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write(code)
-    print(f'Fixed {filename}')
+        # Hand-edited scripts are no longer ours: never prune them, stop tracking
+        for name, status in report:
+            if status == 'hand-edited':
+                manifest.old.pop(name, None)
+        if any(assets[name] != copy for name, copy in copies.items()):
+            assets.update(copies)
+            save_map(out, assets)
+        # A partial selection keeps the manifest entries it didn't touch
+        manifest.save(prune=selection.is_everything(args, FIRST_GAME, LAST_GAME))
+        print(f'Files: {manifest.summary()}')
+        print('All games fixed!')
+    return 0
 
-print('All games fixed!')
 
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# Single-file pack of rendered game pages with a sorted offset index.
+#
+# Layout (all integers little-endian):
+#   header   8s magic, Q entry count, Q index offset, Q reserved
+#   data     page bytes, back to back
+#   index    one (Q key, Q offset, Q length) record per page, sorted by key
+#
+# The key is the game number and the page kind (html/js) packed together, so
+# both pages of a game sit next to each other in the index. PackWriter keeps
+# the index in flat arrays (24 bytes a page) until close(). PackReader maps
+# the file once and binary-searches the index in place; get() returns a
+# memoryview into the mapping, so nothing is copied. Views may outlive the
+# reader: close() leaves the mapping to the last of them.
+import bisect
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+MAGIC = b'GAMEPAK1'
+HEADER = struct.Struct('<8sQQQ')
+RECORD = struct.Struct('<QQQ')
+KINDS = ('html', 'js')
+
+
+def pack_key(num, kind):
+    return num * len(KINDS) + KINDS.index(kind)
+
+
+class PackWriter:
+    def __init__(self, path):
+        self.path = path
+        self._tmp = path + '.tmp'
+        self._f = open(self._tmp, 'wb')
+        self._f.write(HEADER.pack(MAGIC, 0, 0, 0))
+        self._offset = HEADER.size
+        self._keys = array('Q')
+        self._offsets = array('Q')
+        self._lengths = array('Q')
+
+    def add(self, num, kind, data):
+        self._keys.append(pack_key(num, kind))
+        self._offsets.append(self._offset)
+        self._lengths.append(len(data))
+        self._f.write(data)
+        self._offset += len(data)
+
+    def close(self):
+        keys, offsets, lengths = self._keys, self._offsets, self._lengths
+        # The generators add pages in key order; anything else is sorted here
+        if any(a >= b for a, b in zip(keys, keys[1:])):
+            order = sorted(range(len(keys)), key=keys.__getitem__)
+            keys, offsets, lengths = (array('Q', (column[i] for i in order))
+                                      for column in (keys, offsets, lengths))
+            for prev, key in zip(keys, keys[1:]):
+                if prev == key:
+                    num, kind = divmod(key, len(KINDS))
+                    raise ValueError(f'game{num}.{KINDS[kind]} added to the pack twice')
+        records = array('Q', bytes(RECORD.size * len(keys)))
+        records[0::3], records[1::3], records[2::3] = keys, offsets, lengths
+        if sys.byteorder != 'little':
+            records.byteswap()
+        records.tofile(self._f)
+        self._f.seek(0)
+        self._f.write(HEADER.pack(MAGIC, len(keys), self._offset, 0))
+        self._f.close()
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        self._f.close()
+        os.remove(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class _Keys:
+    # Sequence view of the index keys for bisect, read straight from the map
+    def __init__(self, buf, offset, count):
+        self._buf = buf
+        self._offset = offset
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        return struct.unpack_from('<Q', self._buf, self._offset + i * RECORD.size)[0]
+
+
+class PackReader:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count, self._index_offset, _ = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f'{path} is not a game pack')
+        self._view = memoryview(self._map)
+        self._keys = _Keys(self._map, self._index_offset, self._count)
+
+    def __len__(self):
+        return self._count
+
+    def _find(self, num, kind):
+        key = pack_key(num, kind)
+        i = bisect.bisect_left(self._keys, key)
+        if i == self._count or self._keys[i] != key:
+            return None
+        return RECORD.unpack_from(self._map, self._index_offset + i * RECORD.size)
+
+    def __contains__(self, item):
+        return self._find(*item) is not None
+
+    def get(self, num, kind='html'):
+        record = self._find(num, kind)
+        if record is None:
+            raise KeyError(f'game{num}.{kind}')
+        _, offset, length = record
+        return self._view[offset:offset + length]
+
+    def games(self):
+        # (num, kind) for every page, in key order
+        for i in range(self._count):
+            num, kind = divmod(self._keys[i], len(KINDS))
+            yield num, KINDS[kind]
+
+    def close(self):
+        self._view.release()
+        try:
+            self._map.close()
+        except BufferError:
+            # Pages from get() are still in use; the mapping goes away with
+            # the last of them
+            pass
+        self._map = self._view = self._keys = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def main(argv=None):
+    # Print one page from a pack: game_pack.py games.pack 12345 [html|js]
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) not in (2, 3):
+        print('usage: game_pack.py PACK NUM [html|js]')
+        return 2
+    with PackReader(argv[0]) as pack:
+        page = pack.get(int(argv[1]), argv[2] if len(argv) == 3 else 'html')
+        sys.stdout.buffer.write(page)
+        page.release()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# Per-game tuning for the million-game range, as one fixed-width binary.
+#
+# Every game gets a speed, a target count, a palette (base hue and hue step)
+# and a target size, rolled once from a seed with NumPy for the whole range
+# at a time. They are stored a row per game, in
+#
+#   header   8s magic, Q first game, Q game count, Q seed
+#   rows     one packed little-endian record per game, fields in COLUMNS
+#            order, starting on an 8-byte boundary
+#
+# under a content-hashed name in assets/, next to a small game-params.json
+# index giving where the rows start, their size and each field's type,
+# offset in the row and scale. game_dynamic.html reads the index and then
+# fetches game n's row with one HTTP range request, 6 bytes, so a million
+# games cost one ~6 MB file instead of a million.
+#
+# Needs NumPy; the generators don't.
+import argparse
+import json
+import os
+import struct
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from build_manifest import Manifest
+from generate_million_games import FIRST_GAME, LAST_GAME
+from hash_assets import hashed_name
+
+MAGIC = b'GAMEPRM2'
+HEADER = struct.Struct('<8sQQQ')
+INDEX_NAME = 'game-params.json'
+DATA_NAME = 'game-params.bin'
+MANIFEST_NAME = 'game_params'
+DEFAULT_SEED = 104
+
+# (name, dtype, lowest, highest stored value, scale): the value a game
+# gets is stored * scale
+COLUMNS = [
+    ('speed', 'uint8', 5, 40, 0.1),
+    ('targets', 'uint8', 3, 12, 1),
+    ('hue', 'uint16', 0, 359, 1),
+    ('hue_step', 'uint8', 15, 120, 1),
+    ('size', 'uint8', 24, 64, 1),
+]
+
+
+def roll(count, seed=DEFAULT_SEED):
+    # {column: array of count values}; the same seed always gives the same
+    # table
+    rng = np.random.default_rng(seed)
+    return {name: rng.integers(low, high, size=count, dtype=dtype, endpoint=True)
+            for name, dtype, low, high, _ in COLUMNS}
+
+
+def row_dtype():
+    # One game's record: the COLUMNS fields packed, little-endian
+    return np.dtype([(name, np.dtype(dtype).newbyteorder('<')) for name, dtype, _, _, _ in COLUMNS])
+
+
+ROWS_OFFSET = HEADER.size + -HEADER.size % 8
+
+
+def encode(first, columns, seed=DEFAULT_SEED):
+    # (file bytes, field entries for the index)
+    count = len(next(iter(columns.values())))
+    rows = np.empty(count, row_dtype())
+    for name in rows.dtype.names:
+        rows[name] = columns[name]
+    header = HEADER.pack(MAGIC, first, count, seed)
+    entries = [{'name': name, 'type': dtype, 'offset': rows.dtype.fields[name][1],
+                'scale': scale} for name, dtype, _, _, scale in COLUMNS]
+    return header + b'\0' * (ROWS_OFFSET - len(header)) + rows.tobytes(), entries
+
+
+def write_params(out_dir='.', first=FIRST_GAME, last=LAST_GAME, seed=DEFAULT_SEED):
+    # Returns the index; the previous table is removed if it changed
+    data, entries = encode(first, roll(last - first + 1, seed), seed)
+    name = hashed_name(DATA_NAME, data)
+    index = {'version': 2, 'file': name, 'first': first, 'count': last - first + 1,
+             'seed': seed, 'rows': ROWS_OFFSET, 'row_size': row_dtype().itemsize,
+             'columns': entries}
+    manifest = Manifest(out_dir, MANIFEST_NAME)
+    manifest.write(name, data)
+    manifest.write(INDEX_NAME, json.dumps(index, indent=1).encode() + b'\n')
+    manifest.save()
+    return index
+
+
+def lookup(out_dir, index, n):
+    # Game n's parameters, read the way the page does: one read of its row
+    if not index['first'] <= n < index['first'] + index['count']:
+        raise KeyError(f'game{n} is not in the table')
+    with open(os.path.join(out_dir, index['file']), 'rb') as f:
+        f.seek(index['rows'] + (n - index['first']) * index['row_size'])
+        row = f.read(index['row_size'])
+    params = {}
+    for column in index['columns']:
+        dtype = np.dtype(column['type']).newbyteorder('<')
+        value = int(np.frombuffer(row, dtype, count=1, offset=column['offset'])[0])
+        params[column['name']] = round(value * column['scale'], 6)
+    return params
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(description='Write the per-game parameter table.', prog=prog)
+    parser.add_argument('--out', default='.', help='site directory')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                        help=f'random seed; same seed, same table (default: {DEFAULT_SEED})')
+    parser.add_argument('--end', type=int, default=LAST_GAME,
+                        help=f'last game number, inclusive (default: {LAST_GAME})')
+    parser.add_argument('--show', type=int, metavar='N',
+                        help='print game N\'s parameters from the existing table instead')
+    args = parser.parse_args(argv)
+    if args.end < FIRST_GAME:
+        parser.error(f'--end must be at least {FIRST_GAME}, the first game in the table')
+    if np is None:
+        print('game_params.py needs NumPy (pip install numpy)')
+        return 1
+
+    if args.show is not None:
+        try:
+            with open(os.path.join(args.out, INDEX_NAME), 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            print(json.dumps(lookup(args.out, index, args.show)))
+        except (FileNotFoundError, KeyError) as e:
+            print(f'Cannot show game{args.show}: {e}')
+            return 1
+        return 0
+
+    index = write_params(args.out, FIRST_GAME, args.end, args.seed)
+    size = os.path.getsize(os.path.join(args.out, index['file']))
+    print(f'{INDEX_NAME}: {index["count"]:,} games, {len(COLUMNS)} columns, '
+          f'{size:,} bytes in {index["file"]}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,16 @@
 #!/usr/bin/env python3
+import argparse
+import os
+import sys
+
+import build_metrics
+import selection
+from build_manifest import Manifest, content_hash
+from byte_template import Template
+from generate_million_games import GAME_CSS, GAME_CSS_NAME
+from hash_assets import asset_url, load_map, refresh_copy, save_map
+from minify import extract_style, minify_html, minify_js
+
 games = [
     ("Breakout", "🎯", "Break blocks with a bouncing ball", "breakout"),
     ("Asteroids", "🌌", "Destroy asteroids in space", "asteroids"),
@@ -104,15 +116,15 @@ games = [
     ("Rainbow", "🌈", "Follow the rainbow", "rainbow"),
 ]
 
-for i, (name, icon, desc, slug) in enumerate(games, 2):
-    num = f"{i:02d}"
-    html = f'''<!DOCTYPE html>
+
+# Page and script sources; rendered by render_game()
+PAGE_HTML = '''<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{name}</title>
-    <link rel="stylesheet" href="style.css">
+    <link rel="stylesheet" href="{style_css}">
     <style>
         body {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); }}
         #gameCanvas {{ border: 3px solid #fff; background: #000; display: block; margin: 20px auto; }}
@@ -128,11 +140,11 @@ for i, (name, icon, desc, slug) in enumerate(games, 2):
         <p>{desc}</p>
         <p>Score: <span id="score">0</span></p>
     </div>
-    <script src="game{num}.js"></script>
+    <script src="{script}"></script>
 </body>
 </html>'''
-    
-    js = f'''const canvas = document.getElementById('gameCanvas');
+
+GAME_JS = '''const canvas = document.getElementById('gameCanvas');
 const ctx = canvas.getContext('2d');
 let score = 0;
 let gameState = 'playing';
@@ -162,10 +174,124 @@ canvas.addEventListener('click', () => {{
 draw();
 update();
 '''
-    
-    with open(f'game{num}.html', 'w', encoding='utf-8') as f:
-        f.write(html)
-    with open(f'game{num}.js', 'w', encoding='utf-8') as f:
-        f.write(js)
-    print(f'Created game{num}.html and game{num}.js')
 
+# (page, script) templates per minify setting; minified pages link the
+# shared GAME_CSS_NAME instead of carrying the inline style (see minify.py)
+TEMPLATES = {
+    False: (Template(PAGE_HTML), Template(GAME_JS)),
+    True: (Template(minify_html(extract_style(PAGE_HTML, GAME_CSS_NAME)[0])),
+           Template(minify_js(GAME_JS))),
+}
+HTML_TEMPLATE, JS_TEMPLATE = TEMPLATES[False]
+
+
+def render_game(i, name, icon, desc, minify=False, script=None, style_css='style.css'):
+    # script and style_css are the URLs the page loads, gameNN.js and
+    # style.css unless given (main() passes the hashed copies, see
+    # hash_assets.py)
+    values = {'num': b'%02d' % i, 'name': name.encode('utf-8'),
+              'icon': icon.encode('utf-8'), 'desc': desc.encode('utf-8'),
+              'style_css': style_css.encode('utf-8'),
+              'script': (script or f'game{i:02d}.js').encode('utf-8')}
+    html, js = TEMPLATES[minify]
+    return html.render(**values), js.render(**values)
+
+
+def page_script(out_dir, i, js, old_digest):
+    # (script game i's page loads, whether we write it). Our placeholder is
+    # only written where it is missing or still ours: once fix_all_games.py
+    # (or a person) has replaced gameNN.js it is left alone, and a game
+    # whose stub fix_all_games.py shares is pointed at the shared copy.
+    import fix_all_games
+
+    own = f'game{i:02d}.js'
+    try:
+        with open(os.path.join(out_dir, own), 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        shared = fix_all_games.published_name(i)
+        if shared != own and os.path.exists(os.path.join(out_dir, shared)):
+            return shared, False
+        return own, True
+    return own, data == js or content_hash(data) == old_digest
+
+
+# Classic games are numbered from 2 in list order
+FIRST_GAME = 2
+LAST_GAME = FIRST_GAME + len(games) - 1
+
+
+def select_games(args):
+    # (number, name, icon, desc) for the games the selection options pick;
+    # --template matches a game's name or slug
+    template = args.template.lower() if args.template else None
+    for r in selection.ranges(args, FIRST_GAME, LAST_GAME):
+        for i in r:
+            name, icon, desc, slug = games[i - FIRST_GAME]
+            if template is None or template in (name.lower(), slug):
+                yield i, name, icon, desc
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(description='Generate the classic game pages.', prog=prog)
+    parser.add_argument('out', nargs='?', default='.', help='output directory')
+    parser.add_argument('--out', dest='out_dir', help='output directory (same as the positional)')
+    parser.add_argument('--minify', action='store_true',
+                        help=f'minified pages and scripts, with the inline CSS moved to '
+                             f'{GAME_CSS_NAME}; prints the before/after byte totals')
+    selection.add_arguments(parser, FIRST_GAME, LAST_GAME)
+    build_metrics.add_arguments(parser)
+    args = parser.parse_args(argv)
+    out = args.out_dir or args.out
+    if args.template and not any(args.template.lower() in (name.lower(), slug)
+                                 for name, _, _, slug in games):
+        parser.error(f'unknown template {args.template!r}; one of: '
+                     f'{", ".join(slug for _, _, _, slug in games)}')
+
+    with build_metrics.instrumented('generate_games', args):
+        manifest = Manifest(out, 'generate_games')
+        # Once hash_assets.py has run on the site, pages link hashed copies
+        assets = load_map(out)
+        linked = dict(assets)
+        style_css = asset_url('style.css', assets)
+        selected = list(select_games(args))
+        progress = build_metrics.Progress('Games', len(selected), metrics_path=args.metrics_json)
+        if args.minify:
+            manifest.write(GAME_CSS_NAME, GAME_CSS)
+        before = after = 0
+        for done, (i, name, icon, desc) in enumerate(selected, 1):
+            num = f"{i:02d}"
+            js_name = f'game{num}.js'
+            js = render_game(i, name, icon, desc, args.minify)[1]
+            script, ours = page_script(out, i, js, manifest.old.get(js_name))
+            if ours:
+                manifest.write(js_name, js)
+                # A copy of this run's script, not the one hashed last time
+                script = refresh_copy(manifest, assets, js_name, js)
+            else:
+                # Not ours any more: never prune it, stop tracking it
+                manifest.old.pop(js_name, None)
+                script = asset_url(script, assets)
+            html = render_game(i, name, icon, desc, args.minify, script, style_css)[0]
+            manifest.write(f'game{num}.html', html)
+            progress.update(done, manifest.bytes_written)
+            if args.minify:
+                plain = render_game(i, name, icon, desc, script=script, style_css=style_css)
+                before += len(plain[0]) + (len(plain[1]) if ours else 0)
+                after += len(html) + (len(js) if ours else 0)
+        progress.finish()
+        if assets != linked:
+            save_map(out, assets)
+        if args.minify:
+            after += len(GAME_CSS)
+            # An empty selection has nothing to compare
+            change = f' ({after / before - 1:+.1%})' if before else ''
+            print(f'Minified: {before:,} -> {after:,} bytes{change}')
+        # A partial selection keeps the manifest entries it didn't touch
+        manifest.save(prune=selection.is_everything(args, FIRST_GAME, LAST_GAME))
+        print(f'Files: {manifest.summary()}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,24 @@
 #!/usr/bin/env python3
+import argparse
+import math
 import os
+import re
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import build_metrics
+import selection
+import sync_deploy
+from archive_sink import FORMATS, ArchiveWriter, archive_format
+from assemble_index import update_block
+from build_manifest import Manifest, content_hash
+from checkpoint import Checkpoint, CheckpointError
+from byte_template import Template
+from game_pack import PackWriter
+from hash_assets import asset_url, load_map
+from minify import extract_style, minify_css, minify_html, minify_js
+from write_pipeline import QUEUE_DEPTH, WRITERS, WritePipeline
 
 # Game templates with variations
 game_templates = [
@@ -15,21 +34,22 @@ game_templates = [
     ("Attack", "⚔️", "Attack enemies"),
 ]
 
-# Generate games 104-1000103 (1 million games)
-print("Generating 1,000,000 games...")
+# Games 104-1000103 (1 million games)
+FIRST_GAME = 104
+LAST_GAME = 1000103
 
-for i in range(104, 1000104):
-    num = f"{i}"
-    template = game_templates[i % len(game_templates)]
-    name = f"{template[0]} Game {i}"
-    
-    html = f'''<!DOCTYPE html>
+# IDs per shard in parallel mode
+SHARD_SIZE = 10000
+
+
+# Page and script sources; {scripts} is filled in below per output mode
+PAGE_HTML = '''<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{name}</title>
-    <link rel="stylesheet" href="style.css">
+    <title>{label} Game {num}</title>
+    <link rel="stylesheet" href="{root}{style_css}">
     <style>
         body {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); }}
         #gameCanvas {{ border: 3px solid #fff; background: #000; display: block; margin: 20px auto; }}
@@ -38,24 +58,23 @@ for i in range(104, 1000104):
     </style>
 </head>
 <body>
-    <a href="index.html" class="back-btn">← Back</a>
+    <a href="{root}index.html" class="back-btn">← Back</a>
     <canvas id="gameCanvas" width="800" height="600"></canvas>
     <div class="info">
-        <h2>{template[1]} {name}</h2>
-        <p>{template[2]}</p>
+        <h2>{icon} {label} Game {num}</h2>
+        <p>{desc}</p>
         <p>Score: <span id="score">0</span></p>
     </div>
-    <script src="game{num}.js"></script>
+    {scripts}
 </body>
 </html>'''
-    
-    js = f'''// {name}
-const canvas = document.getElementById('gameCanvas');
+
+GAME_JS = '''const canvas = document.getElementById('gameCanvas');
 const ctx = canvas.getContext('2d');
 let score = 0;
 const targets = [];
 let gameStarted = false;
-const gameType = {i % 10};
+const gameType = {game_type};
 
 function createTarget() {{
     targets.push({{
@@ -136,14 +155,594 @@ function gameLoop() {{
 }}
 gameLoop();
 '''
-    
-    with open(f'game{num}.html', 'w', encoding='utf-8') as f:
-        f.write(html)
-    with open(f'game{num}.js', 'w', encoding='utf-8') as f:
-        f.write(js)
-    
-    if i % 10000 == 0:
-        print(f'Generated {i} games...')
 
-print('Done! Generated 1,000,000 games.')
 
+# Page and script templates; rendered by render_game(). With minify the
+# inline <style> moves out to GAME_CSS (one cacheable file for every page)
+# and pages and scripts lose indentation and comments (see minify.py).
+def page_template(scripts, minify=False):
+    source = PAGE_HTML.replace('{scripts}', scripts)
+    if minify:
+        source = minify_html(extract_style(source, '{root}' + GAME_CSS_NAME)[0])
+    return Template(source)
+
+
+def script_template(header, minify=False):
+    return Template(minify_js(header + GAME_JS) if minify else header + GAME_JS)
+
+
+GAME_CSS = minify_css(extract_style(PAGE_HTML, '')[1].replace('{{', '{').replace('}}', '}')
+                      ).encode('utf-8')
+GAME_CSS_NAME = f'game-{content_hash(GAME_CSS)[:12]}.css'
+HTML_TEMPLATE = page_template('<script src="game{num}.js"></script>')
+JS_TEMPLATE = script_template('// {label} Game {num}\n')
+
+# Shared-runtime mode: every page carries a tiny GAME_CONFIG block and loads
+# one content-addressed copy of the game script instead of its own gameN.js
+SHARED_SCRIPTS = ('<script>const GAME_CONFIG = {{ num: {num}, gameType: {game_type} }};</script>\n'
+                  '    <script src="{root}{runtime}"></script>')
+RUNTIME_HEADER = '// Shared runtime for the million-game range\n'
+
+
+def runtime(minify=False):
+    # (file name, contents) of the shared runtime
+    data = script_template(RUNTIME_HEADER, minify).bind(game_type='GAME_CONFIG.gameType').render()
+    return f'runtime-{content_hash(data)[:12]}.js', data
+
+
+RUNTIME_NAME, RUNTIME_JS = runtime()
+SHARED_HTML_TEMPLATE = page_template(SHARED_SCRIPTS).bind(runtime=RUNTIME_NAME)
+
+# (page, script, shared-runtime page) templates per minify setting
+TEMPLATES = {
+    False: (HTML_TEMPLATE, JS_TEMPLATE, SHARED_HTML_TEMPLATE),
+    True: (page_template('<script src="game{num}.js"></script>', minify=True),
+           script_template('', minify=True),
+           page_template(SHARED_SCRIPTS, minify=True).bind(runtime=runtime(minify=True)[0])),
+}
+
+# Output layouts: where gameN.html/js go, and the prefix that leads from a
+# page back to the site root. "sharded" splits the range into
+# games/<NN>/<NN>/ directories of 100 games each (game12345 ->
+# games/01/23/), so no directory holds more than a couple hundred files.
+LAYOUTS = {'flat': '', 'sharded': '../../../'}
+
+
+def game_dir(i, layout='flat'):
+    if layout == 'flat':
+        return ''
+    return f'games/{i // 10000 % 100:02d}/{i // 100 % 100:02d}/'
+
+
+def bind_templates(variant, layout, minify=False, style_css='style.css'):
+    # Everything but the game number repeats with period VARIANTS (template
+    # and gameType), so those slots are compiled in once per variant, layout
+    # and minify setting, and render_game() only fills {num}
+    label, icon, desc = game_templates[variant % len(game_templates)]
+    values = {'label': label, 'icon': icon, 'desc': desc, 'game_type': str(variant % 10),
+              'root': LAYOUTS[layout], 'style_css': style_css}
+    return tuple(template.bind(**values) for template in TEMPLATES[minify])
+
+
+def bind_all(style_css='style.css'):
+    return {(layout, minify): [bind_templates(variant, layout, minify, style_css)
+                               for variant in range(VARIANTS)]
+            for layout in LAYOUTS for minify in (False, True)}
+
+
+VARIANTS = math.lcm(len(game_templates), 10)
+style_css = 'style.css'
+bound_templates = bind_all()
+
+
+def link_site(site_dir):
+    # Pages link the style.css copy hash_assets.py made for the site in
+    # site_dir, if any; worker processes call this too, since they may not
+    # inherit the parent's templates
+    global style_css, bound_templates
+    url = asset_url('style.css', load_map(site_dir))
+    if url != style_css:
+        style_css, bound_templates = url, bind_all(url)
+
+
+def render_game(i, layout='flat', minify=False):
+    html, js, _ = bound_templates[layout, minify][i % VARIANTS]
+    num = b'%d' % i
+    return html.render(num=num), js.render(num=num)
+
+
+def render_shared_page(i, layout='flat', minify=False):
+    return bound_templates[layout, minify][i % VARIANTS][2].render(num=b'%d' % i)
+
+
+MANIFEST_NAME = 'generate_million_games'
+
+
+def game_files(i, layout='flat'):
+    path = game_dir(i, layout)
+    return f'{path}game{i}.html', f'{path}game{i}.js'
+
+
+# Old /gameN.html URLs under the sharded layout. Netlify placeholders can't
+# compute the shard directories and a rule per game would be millions of
+# lines, so one rule hands every /game* URL that isn't a file to this page,
+# which sends the browser on to games/NN/NN/gameN.html (or home).
+RESOLVER_NAME = 'game-resolver.html'
+RESOLVER_HTML = '''<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <title>Finding game...</title>
+    <script>
+    (function () {{
+        const m = /^\\/game([1-9]\\d*)\\.html$/.exec(location.pathname);
+        const n = m ? Number(m[1]) : 0;
+        if (n >= {first} && n <= {last}) {{
+            const pad = k => String(Math.floor(k) % 100).padStart(2, '0');
+            location.replace(`/games/${{pad(n / 10000)}}/${{pad(n / 100)}}/game${{n}}.html` +
+                             location.search + location.hash);
+        }} else {{
+            location.replace('/');
+        }}
+    }})();
+    </script>
+</head>
+<body>
+    <p><a href="/">Back to all games</a></p>
+</body>
+</html>
+'''.format(first=FIRST_GAME, last=LAST_GAME).encode('utf-8')
+
+
+def redirect_lines(layout):
+    # _redirects rules keeping /gameN.html working for a non-flat layout;
+    # files that exist (game_dynamic.html, the classic pages) are never
+    # rewritten, since the rule isn't forced
+    if layout == 'flat':
+        return
+    yield f'/game*    /{RESOLVER_NAME}    200'
+
+
+def write_game(i, pipeline, shared_runtime=False, layout='flat', minify=False):
+    html_name, js_name = game_files(i, layout)
+    if shared_runtime:
+        pipeline.put(i, html_name, render_shared_page(i, layout, minify))
+        return
+    html, js = render_game(i, layout, minify)
+    pipeline.put(i, html_name, html)
+    pipeline.put(i, js_name, js)
+
+
+def generate_shard(start, end, out_dir='.', old=None, progress=None, shared_runtime=False,
+                   layout='flat', step=1, minify=False, writers=WRITERS,
+                   queue_depth=QUEUE_DEPTH):
+    # Writes games range(start, end, step) and returns (start, end, manifest,
+    # errors) so a failed game doesn't take the rest of the shard down with
+    # it. `old` is the slice of the previous manifest covering this shard;
+    # anything in it this shard no longer produces (e.g. gameN.js in
+    # shared-runtime mode) is removed.
+    # Pages are rendered here and written by `writers` threads behind a queue
+    # of at most queue_depth files (see write_pipeline.py); writers=0 writes
+    # each file before rendering the next.
+    # progress, if given, is called with (games rendered, bytes written, errors).
+    link_site(out_dir)
+    manifest = Manifest(out_dir, MANIFEST_NAME, old=old)
+    with WritePipeline(manifest, writers, queue_depth) as pipeline:
+        for done, i in enumerate(range(start, end, step), 1):
+            write_game(i, pipeline, shared_runtime, layout, minify)
+            if progress:
+                progress(done, manifest.bytes_written, len(pipeline.errors))
+    errors = sorted(pipeline.errors.items())
+    if not errors:
+        manifest.prune()
+    return start, end, manifest, errors
+
+
+def render_shard(start, end, shared_runtime=False, minify=False, site_dir='.'):
+    # Rendered (i, html, js) for games start..end-1, linking site_dir's
+    # assets; js is None in shared-runtime mode
+    link_site(site_dir)
+    if shared_runtime:
+        return [(i, render_shared_page(i, minify=minify), None) for i in range(start, end)]
+    return [(i, *render_game(i, minify=minify)) for i in range(start, end)]
+
+
+def iter_rendered(start, end, workers=1, shard_size=SHARD_SIZE, shared_runtime=False,
+                  minify=False, site_dir='.'):
+    # Rendered games in ID order, for sinks that write a single stream (pack,
+    # archive). With workers the shards render in parallel and are consumed
+    # in order, so the stream is the same as a serial run.
+    shards = split_shards(start, end, shard_size)
+    if not shards:
+        return
+    if workers == 1:
+        for s, e in shards:
+            yield from render_shard(s, e, shared_runtime, minify, site_dir)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        starts, ends = zip(*shards)
+        for games in pool.map(render_shard, starts, ends, [shared_runtime] * len(shards),
+                              [minify] * len(shards), [site_dir] * len(shards)):
+            yield from games
+
+
+def write_pack(path, start, end, workers=1, shard_size=SHARD_SIZE, shared_runtime=False,
+               progress=None, minify=False, site_dir='.'):
+    count = 0
+    size = 0
+    with PackWriter(path) as pack:
+        for i, html, js in iter_rendered(start, end, workers, shard_size, shared_runtime,
+                                         minify, site_dir):
+            pack.add(i, 'html', html)
+            size += len(html)
+            if js is not None:
+                pack.add(i, 'js', js)
+                size += len(js)
+            count += 1
+            if progress:
+                progress.update(count, size)
+    return count
+
+
+# Site files the generator produces itself, left out of an archive's copy of
+# the site directory (old outputs, other bundles)
+ARCHIVE_EXCLUDE = ('runtime-*.js', 'game-*.css', '*.tmp', '*.zip', '*.tar.gz', '*.tgz')
+GENERATED_NAME = re.compile(r'(?:^|/)game(\d+)\.(?:html|js)(?:\.gz|\.br)?$')
+
+
+def static_files(site_dir):
+    # Published files in the site directory (see sync_deploy.py) that aren't
+    # million-range pages or their precompress.py siblings, in name order
+    files = sync_deploy.find_files(site_dir, sync_deploy.EXCLUDE + ARCHIVE_EXCLUDE)
+    return sorted(name for name in files if not _generated(name))
+
+
+def _generated(name):
+    m = GENERATED_NAME.search(name)
+    return m is not None and int(m.group(1)) >= FIRST_GAME
+
+
+def write_archive(path, start, end, workers=1, shard_size=SHARD_SIZE, shared_runtime=False,
+                  progress=None, minify=False, site_dir='.'):
+    # One .tar.gz/.zip of the site: the static files from site_dir, then the
+    # shared assets, then every page in ID order, streamed as rendered
+    count = 0
+    size = 0
+    with ArchiveWriter(path) as archive:
+        for name in static_files(site_dir):
+            archive.add_file(name, os.path.join(site_dir, name))
+        for name, data in shared_assets(shared_runtime, minify):
+            archive.add(name, data)
+        for i, html, js in iter_rendered(start, end, workers, shard_size, shared_runtime,
+                                         minify, site_dir):
+            html_name, js_name = game_files(i)
+            archive.add(html_name, html)
+            size += len(html)
+            if js is not None:
+                archive.add(js_name, js)
+                size += len(js)
+            count += 1
+            if progress:
+                progress.update(count, size)
+    return count, archive.count
+
+
+def split_shards(start, end, shard_size=SHARD_SIZE):
+    return [(s, min(s + shard_size, end)) for s in range(start, end, shard_size)]
+
+
+def select_shards(selected, shard_size=SHARD_SIZE):
+    # Shards of shard_size games over a selection (see selection.py), as
+    # (start, end, step); contiguous selections give the same shards as
+    # split_shards()
+    shards = []
+    for r in selected:
+        for k in range(0, len(r), shard_size):
+            part = r[k:k + shard_size]
+            shards.append((part.start, min(part.stop, r.stop), part.step))
+    return shards
+
+
+def shard_names(start, end, step=1):
+    # Outputs of the shard's games in every layout, so a shard also cleans up
+    # files it wrote under a different layout last time
+    return [name for i in range(start, end, step) for lay in LAYOUTS
+            for name in game_files(i, lay)]
+
+
+def generate_parallel(start, end, manifest, workers=None, shard_size=SHARD_SIZE,
+                      shared_runtime=False, progress=None, layout='flat', minify=False,
+                      writers=WRITERS, queue_depth=QUEUE_DEPTH):
+    return generate_shards(select_shards([range(start, end)], shard_size), manifest, workers,
+                           shared_runtime, progress, layout, minify=minify, writers=writers,
+                           queue_depth=queue_depth)
+
+
+def generate_shards(shards, manifest, workers=None, shared_runtime=False, progress=None,
+                    layout='flat', checkpoint=None, minify=False, writers=WRITERS,
+                    queue_depth=QUEUE_DEPTH):
+    # shards: (start, end, step) tuples from select_shards(). Every game is
+    # rendered by the same render_game() no matter which shard it lands in,
+    # so the files are byte-identical whatever the worker count. workers=1
+    # runs the shards in this process. Shards that finish cleanly are
+    # recorded in the checkpoint, if any.
+    errors = []
+    games_done = 0
+
+    def finished(shard, result):
+        nonlocal games_done
+        s, e, shard_manifest, shard_errors = result
+        manifest.merge(shard_manifest)
+        errors.extend(shard_errors)
+        games_done += len(range(*shard))
+        if shard_errors:
+            print(f'Shard {s}-{e - 1}: {len(shard_errors)} errors')
+        elif checkpoint:
+            checkpoint.record(shard, shard_manifest.files)
+        if progress:
+            progress.update(games_done, manifest.bytes_written, len(errors))
+
+    def shard_args(shard):
+        s, e, step = shard
+        return s, e, manifest.out_dir, manifest.subset(shard_names(s, e, step))
+
+    if workers == 1:
+        for shard in shards:
+            report = None
+            if progress:
+                def report(done, size, failed,
+                           base=(games_done, manifest.bytes_written, len(errors))):
+                    progress.update(base[0] + done, base[1] + size, base[2] + failed)
+            finished(shard, generate_shard(*shard_args(shard), report, shared_runtime, layout,
+                                           shard[2], minify, writers, queue_depth))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(generate_shard, *shard_args(shard),
+                                   shared_runtime=shared_runtime, layout=layout,
+                                   step=shard[2], minify=minify, writers=writers,
+                                   queue_depth=queue_depth): shard
+                       for shard in shards}
+            for future in as_completed(futures):
+                finished(futures[future], future.result())
+    errors.sort()
+    return errors
+
+
+def resume_shards(checkpoint, params, manifest):
+    # Folds the shards a crashed run finished into the manifest and returns
+    # them; a shard whose last outputs don't check out is left to redo
+    done = checkpoint.resume(params)
+    for shard, files in list(done.items()):
+        if not checkpoint.verify(files):
+            print(f'Shard {shard[0]}-{shard[1] - 1}: outputs differ from the checkpoint, '
+                  f'regenerating')
+            del done[shard]
+            continue
+        shard_manifest = Manifest(manifest.out_dir, MANIFEST_NAME,
+                                  old=manifest.subset(shard_names(*shard)))
+        shard_manifest.files = files
+        manifest.merge(shard_manifest)
+    return done
+
+
+def update_redirects(path, layout):
+    # Rules live in a marked block at the top of _redirects, ahead of any
+    # catch-all rule; the block is added on first use and a flat layout
+    # empties it again
+    update_block(path, 'game-redirects', lambda: redirect_lines(layout),
+                 create=layout != 'flat')
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(description='Generate the million-game range.', prog=prog)
+    selection.add_arguments(parser, FIRST_GAME, LAST_GAME)
+    parser.add_argument('--out', default='.', help='output directory')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='worker processes; 0 uses every core (default: 1, serial)')
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE)
+    parser.add_argument('--writers', type=int, default=WRITERS,
+                        help='writer threads per worker, so rendering overlaps disk writes; '
+                             f'0 writes inline (default: {WRITERS})')
+    parser.add_argument('--queue-depth', type=int, default=QUEUE_DEPTH,
+                        help='rendered files held for the writers before rendering waits '
+                             f'(default: {QUEUE_DEPTH})')
+    parser.add_argument('--shared-runtime', action='store_true',
+                        help=f'write one shared {RUNTIME_NAME} instead of a gameN.js per game')
+    parser.add_argument('--layout', choices=sorted(LAYOUTS), default='flat',
+                        help='flat: gameN.* in --out; sharded: games/NN/NN/gameN.* plus '
+                             'a _redirects rule for the old URLs (default: flat)')
+    parser.add_argument('--minify', action='store_true',
+                        help=f'minified pages and scripts, with the inline CSS moved to '
+                             f'{GAME_CSS_NAME}; prints the before/after byte totals')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue an interrupted run from its checkpoint; the other '
+                             'options must match the interrupted run')
+    parser.add_argument('--pack', metavar='PATH',
+                        help='write all pages into one pack file (see game_pack.py) '
+                             'instead of one file per page')
+    parser.add_argument('--archive', metavar='PATH',
+                        help=f'stream the whole site into one {"/".join(FORMATS)} bundle: the '
+                             f'files in --out plus every page, without writing the pages out')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='print the files, bytes, compressed size and estimated wall time '
+                             'the run would need, and whether --out has room for it, '
+                             'without generating it (see plan_capacity.py)')
+    build_metrics.add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.writers < 0 or args.queue_depth < 1:
+        parser.error('--writers must be 0 or more and --queue-depth at least 1')
+    if args.workers < 0 or args.shard_size < 1:
+        parser.error('-j/--workers must be 0 or more and --shard-size at least 1')
+    if args.dry_run and (args.resume or args.pack or args.archive):
+        parser.error('--dry-run plans a fresh run; it does not apply to --resume, --pack '
+                     'or --archive')
+    if args.pack and args.archive:
+        parser.error('choose one of --pack and --archive')
+    sink = '--pack' if args.pack else '--archive' if args.archive else None
+    if args.resume and sink:
+        parser.error(f'--resume does not apply to {sink} (it is only replaced once complete)')
+    if sink and (args.ids or args.template):
+        parser.error(f'{sink} takes a --start/--end range, not --ids or --template')
+    if args.archive and archive_format(args.archive) is None:
+        parser.error(f'--archive must end in {", ".join(FORMATS)}')
+    if sink and args.layout != 'flat':
+        parser.error(f'{sink} writes the flat layout')
+    if args.template and template_index(args.template) is None:
+        parser.error(f'unknown template {args.template!r}; one of: '
+                     f'{", ".join(label for label, _, _ in game_templates)}')
+
+    with build_metrics.instrumented(MANIFEST_NAME, args):
+        return generate(args)
+
+
+def template_index(name):
+    for k, (label, _, _) in enumerate(game_templates):
+        if label.lower() == name.lower():
+            return k
+    return None
+
+
+def select_games(args):
+    # Game numbers the --start/--end/--ids/--template options pick, as ranges;
+    # game i uses template i % len(game_templates)
+    selected = selection.ranges(args, FIRST_GAME, LAST_GAME)
+    if args.template:
+        selected = selection.every(selected, template_index(args.template), len(game_templates))
+    return selected
+
+
+def sink_range(args):
+    # (start, end) of the games a pack or archive holds: --start/--end
+    # clipped to the million range like any selection (sinks take no --ids
+    # or --template, so it is one range or none)
+    selected = select_games(args)
+    return (selected[0].start, selected[0].stop) if selected else (FIRST_GAME, FIRST_GAME)
+
+
+def shared_assets(shared_runtime=False, minify=False, layout='flat'):
+    # (name, contents) of the files every page of a run links to, and the
+    # old-URL resolver of a sharded layout
+    assets = []
+    if shared_runtime:
+        assets.append(runtime(minify))
+    if minify:
+        assets.append((GAME_CSS_NAME, GAME_CSS))
+    if layout != 'flat':
+        assets.append((RESOLVER_NAME, RESOLVER_HTML))
+    return assets
+
+
+def write_assets(manifest, shared_runtime=False, minify=False, layout='flat'):
+    for name, data in shared_assets(shared_runtime, minify, layout):
+        manifest.write(name, data)
+
+
+def minify_report(selected, layout='flat', shared_runtime=False):
+    # (before, after) bytes of the selected games' pages and scripts without
+    # and with --minify, shared files included. Output size only depends on
+    # the variant and the length of the game number, so each class is
+    # rendered once and multiplied out.
+    classes = Counter(i % VARIANTS * 10 + len(str(i)) for r in selected for i in r)
+    totals = []
+    for minify in (False, True):
+        total = len(runtime(minify)[1]) if shared_runtime else 0
+        total += len(GAME_CSS) if minify else 0
+        for key, count in classes.items():
+            html, js, shared_html = bound_templates[layout, minify][key // 10]
+            num = b'0' * (key % 10)
+            if shared_runtime:
+                total += count * len(shared_html.render(num=num))
+            else:
+                total += count * (len(html.render(num=num)) + len(js.render(num=num)))
+        totals.append(total)
+    return totals
+
+
+def generate(args):
+    link_site(args.out)
+    # Sinks get the clipped selection too; for an archive, classic pages
+    # below FIRST_GAME come in with the site's static files
+    start, end = sink_range(args)
+    if args.archive:
+        print(f'Archiving {end - start:,} games...')
+        progress = build_metrics.Progress('Games', end - start, metrics_path=args.metrics_json)
+        count, entries = write_archive(args.archive, start, end, args.workers or None,
+                                       args.shard_size, args.shared_runtime, progress,
+                                       args.minify, args.out)
+        progress.finish()
+        print(f'Done! Archived {count:,} games ({entries:,} entries) into {args.archive}.')
+        return 0
+
+    if args.dry_run:
+        # Before anything is created: a plan leaves --out as it was
+        import plan_capacity
+        return plan_capacity.plan(args, select_games(args))
+
+    os.makedirs(args.out, exist_ok=True)
+    manifest = Manifest(args.out, MANIFEST_NAME)
+
+    if args.pack:
+        print(f'Generating {end - start:,} games...')
+        progress = build_metrics.Progress('Games', end - start, metrics_path=args.metrics_json)
+        write_assets(manifest, args.shared_runtime, args.minify)
+        count = write_pack(args.pack, start, end, args.workers or None, args.shard_size,
+                           args.shared_runtime, progress, args.minify, args.out)
+        progress.finish()
+        manifest.save(prune=False)
+        print(f'Done! Packed {count:,} games into {args.pack}.')
+        return 0
+
+    # Finished shards are checkpointed as the run goes, so --resume can pick
+    # up where a killed run stopped
+    selected = select_games(args)
+    shards = select_shards(selected, args.shard_size)
+    checkpoint = Checkpoint(args.out, MANIFEST_NAME)
+    params = {'games': [[r.start, r.stop, r.step] for r in selected],
+              'shard_size': args.shard_size, 'layout': args.layout,
+              'shared_runtime': args.shared_runtime, 'minify': args.minify}
+    if args.resume:
+        try:
+            done = resume_shards(checkpoint, params, manifest)
+        except CheckpointError as e:
+            print(f'Cannot resume: {e}')
+            return 1
+        shards = [shard for shard in shards if shard not in done]
+        print(f'Resuming: {len(done)} shards already done')
+    else:
+        checkpoint.start(params)
+
+    remaining = sum(len(range(*shard)) for shard in shards)
+    print(f'Generating {remaining:,} games...')
+    progress = build_metrics.Progress('Games', remaining, metrics_path=args.metrics_json)
+    write_assets(manifest, args.shared_runtime, args.minify, args.layout)
+    errors = generate_shards(shards, manifest, args.workers or None, args.shared_runtime,
+                             progress, args.layout, checkpoint, args.minify, args.writers,
+                             args.queue_depth)
+    progress.finish()
+    if args.minify:
+        before, after = minify_report(selected, args.layout, args.shared_runtime)
+        # An empty selection has nothing to compare
+        change = f' ({after / before - 1:+.1%})' if before else ''
+        print(f'Minified: {before:,} -> {after:,} bytes{change}')
+    update_redirects(os.path.join(args.out, '_redirects'), args.layout)
+    if args.layout == 'flat':
+        # The emptied block no longer points anything at the resolver
+        manifest.remove(RESOLVER_NAME)
+
+    # Only a full run knows which old outputs are stale; a slice keeps the rest
+    full_run = selection.is_everything(args, FIRST_GAME, LAST_GAME) and not errors
+    manifest.save(prune=full_run)
+    print(f'Files: {manifest.summary()}')
+
+    for i, message in errors[:20]:
+        print(f'Failed game{i}: {message}')
+    if errors:
+        checkpoint.close()
+        print(f'{len(errors)} games failed; rerun with --resume to retry them.')
+        return 1
+    checkpoint.remove()
+    print(f'Done! Generated {selection.count(selected):,} games.')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
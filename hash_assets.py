@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# Content-hashed asset names for long-lived caching.
+#
+# Every local stylesheet and script the hand-written pages reference
+# (index.html, the classic gameNN.html pages, pong.html, ...) is copied to
+# assets/<name>.<hash><ext> and the references are rewritten to the copy, so
+# a changed file gets a new URL and the old one can be cached forever. The
+# name -> hashed name map is kept in assets.json in the site directory, which
+# the generators read so their templates link the same copies (see
+# asset_url()); a generator that rewrites a copied script writes its new
+# copy too (see refresh_copy()). Reruns map already-hashed references back to
+# their source, so the step is idempotent; copies no longer referenced are
+# removed.
+#
+# It also keeps a marked block in Netlify's _headers: immutable caching for
+# hashed files, revalidation for HTML. Run it after the generators:
+#
+#     python3 sitegen.py classic && python3 sitegen.py fix && python3 hash_assets.py
+import argparse
+import json
+import os
+import re
+import sys
+
+from assemble_index import update_block
+from build_manifest import Manifest, content_hash
+
+ASSET_DIR = 'assets'
+MAP_NAME = 'assets.json'
+
+REFERENCE = re.compile(r'((?:src|href)=")([^"#?:]+\.(?:css|js))(")')
+HASHED = re.compile(rf'^{ASSET_DIR}/(.+)\.[0-9a-f]{{12}}(\.\w+)$')
+# gameN.html from this number up belongs to generate_million_games.py, which
+# links assets through asset_url() instead of being rewritten here
+GENERATED_PAGE = re.compile(r'^game(\d+)\.html$')
+FIRST_GENERATED = 104
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=0, must-revalidate'
+
+
+def load_map(root):
+    # The asset map of the site in root
+    try:
+        with open(os.path.join(root, MAP_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_map(root, assets):
+    tmp = os.path.join(root, MAP_NAME + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(assets, f, indent=1, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp, os.path.join(root, MAP_NAME))
+
+
+def asset_url(name, assets):
+    # The hashed copy of a site asset in an asset map, or the name itself
+    # before hash_assets.py has run
+    return assets.get(name, name)
+
+
+def hashed_name(name, data):
+    stem, ext = os.path.splitext(name)
+    return f'{ASSET_DIR}/{stem}.{content_hash(data)[:12]}{ext}'
+
+
+def refresh_copy(manifest, assets, name, data):
+    # For a generator writing name: once hash_assets.py has copied it, pages
+    # must link a copy of these bytes, not the last run's. Writes that copy,
+    # records it in assets and returns its name; a file without a copy is
+    # returned as it is
+    if name not in assets:
+        return name
+    assets[name] = hashed_name(name, data)
+    manifest.write(assets[name], data)
+    return assets[name]
+
+
+def find_pages(root):
+    for entry in os.scandir(root):
+        if not entry.is_file() or not entry.name.endswith('.html'):
+            continue
+        m = GENERATED_PAGE.match(entry.name)
+        if m and int(m.group(1)) >= FIRST_GENERATED:
+            continue
+        yield entry.name
+
+
+def source_name(ref, reverse):
+    # The file a (possibly already hashed) reference stands for
+    if ref in reverse:
+        return reverse[ref]
+    m = HASHED.match(ref)
+    return m.group(1) + m.group(2) if m else ref
+
+
+def hash_assets(root='.', extra=(), dry_run=False):
+    # Returns (asset map, pages rewritten); extra names assets that are
+    # linked from generated pages rather than the pages scanned here
+    reverse = {hashed: name for name, hashed in load_map(root).items()}
+    manifest = Manifest(root, 'hash_assets')
+    assets = {}
+
+    def hashed_ref(m):
+        name = source_name(m.group(2), reverse)
+        if name not in assets:
+            try:
+                with open(os.path.join(root, name), 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                # Not ours (or missing): leave the reference alone
+                return m.group()
+            assets[name] = hashed_name(name, data)
+            if not dry_run:
+                manifest.write(assets[name], data)
+        return m.group(1) + assets[name] + m.group(3)
+
+    for name in extra:
+        hashed_ref(REFERENCE.match(f'href="{name}"'))
+
+    changed = []
+    for page in sorted(find_pages(root)):
+        path = os.path.join(root, page)
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            html = f.read()
+        rewritten = REFERENCE.sub(hashed_ref, html)
+        if rewritten == html:
+            continue
+        changed.append(page)
+        if not dry_run:
+            tmp = path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8', newline='') as f:
+                f.write(rewritten)
+            os.replace(tmp, path)
+
+    if not dry_run:
+        manifest.save()
+        save_map(root, assets)
+    return assets, changed
+
+
+def header_lines(immutable=()):
+    # Netlify _headers rules: hashed files never change, so they may be
+    # cached for a year; pages must be revalidated to pick up new hashes
+    for path in [f'/{ASSET_DIR}/*', *(f'/{name}' for name in immutable)]:
+        yield path
+        yield f'  Cache-Control: {IMMUTABLE}'
+    for path in ('/', '/*.html'):
+        yield path
+        yield f'  Cache-Control: {REVALIDATE}'
+
+
+def main(argv=None):
+    import generate_million_games as million
+
+    parser = argparse.ArgumentParser(description='Give site assets content-hashed names.')
+    parser.add_argument('--out', default='.', help='site directory')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='list what would be hashed and rewritten without writing anything')
+    args = parser.parse_args(argv)
+
+    # The million-game pages link style.css through asset_url(); their own
+    # runtime and stylesheet names are content-hashed by the generator
+    assets, changed = hash_assets(args.out, extra=['style.css'], dry_run=args.dry_run)
+    immutable = sorted({million.runtime(False)[0], million.runtime(True)[0],
+                        million.GAME_CSS_NAME})
+    for name, hashed in sorted(assets.items()):
+        print(f'{name} -> {hashed}')
+    print(f'{len(assets)} assets, {len(changed)} pages '
+          f'{"to rewrite" if args.dry_run else "rewritten"}')
+    if not args.dry_run:
+        if update_block(os.path.join(args.out, '_headers'), 'cache-headers',
+                        lambda: header_lines(immutable)):
+            print('Updated _headers')
+        print('Rerun the million-game generator if style.css changed')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
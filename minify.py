@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# Conservative HTML/CSS/JS minification for generated pages.
+#
+# These only drop what can't change behaviour: indentation, blank lines,
+# comments and CSS whitespace. JS keeps its line breaks (no reliance on
+# automatic semicolon insertion), template literals are left verbatim, and
+# the contents of <pre>/<textarea> are never touched. The generators run
+# their template sources through these once, at import time, so minified
+# output costs nothing per page.
+import re
+
+CSS_STRING = re.compile(r'''("(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')''')
+CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+CSS_SPACE = re.compile(r'\s*([{};,>])\s*|(:)\s+')
+
+HTML_RAW = re.compile(r'(<(script|style|pre|textarea)\b([^>]*)>(.*?)</\2\s*>)', re.S | re.I)
+HTML_COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.S)
+HTML_SPACE = re.compile(r'\s+')
+
+STYLE_BLOCK = re.compile(r'[ \t]*<style>(.*?)</style>\n?', re.S)
+
+
+def minify_css(text):
+    parts = CSS_STRING.split(text)
+    for k in range(0, len(parts), 2):
+        code = ' '.join(CSS_COMMENT.sub('', parts[k]).split())
+        parts[k] = CSS_SPACE.sub(lambda m: m.group(1) or m.group(2), code)
+    return ''.join(parts).replace(';}', '}').strip()
+
+
+def minify_js(text):
+    lines = []
+    in_template = False
+    continued = False
+    for line in text.split('\n'):
+        if in_template or continued:
+            # Inside a multi-line template literal or string: verbatim
+            lines.append(line)
+        else:
+            stripped = line.strip()
+            if stripped and not stripped.startswith('//'):
+                lines.append(stripped)
+        if _backticks(line) % 2:
+            in_template = not in_template
+        continued = line.endswith('\\')
+    return '\n'.join(lines)
+
+
+def _backticks(line):
+    return len(re.findall(r'(?<!\\)`', line))
+
+
+def minify_html(text):
+    out = []
+    pos = 0
+    for m in HTML_RAW.finditer(text):
+        out.append(_collapse(text[pos:m.start()]))
+        tag, attrs, body = m.group(2).lower(), m.group(3), m.group(4)
+        if tag == 'style':
+            body = minify_css(body)
+        elif tag == 'script' and 'src=' not in attrs:
+            body = minify_js(body)
+        out.append(f'<{m.group(2)}{attrs}>{body}</{m.group(2)}>')
+        pos = m.end()
+    out.append(_collapse(text[pos:]))
+    return ''.join(out).strip()
+
+
+def _collapse(html):
+    # Whitespace runs become one newline (if they had one) or one space
+    html = HTML_COMMENT.sub('', html)
+    return HTML_SPACE.sub(lambda m: '\n' if '\n' in m.group() else ' ', html)
+
+
+def extract_style(html, href):
+    # Moves a page's inline <style> block out into a stylesheet: returns the
+    # page with a <link> to href in its place, and the block's CSS
+    m = STYLE_BLOCK.search(html)
+    if not m:
+        raise ValueError('page has no <style> block')
+    indent = m.group()[:len(m.group()) - len(m.group().lstrip(' \t'))]
+    link = f'{indent}<link rel="stylesheet" href="{href}">\n'
+    return html[:m.start()] + link + html[m.end():], m.group(1)
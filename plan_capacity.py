@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# Capacity plan for a generate_million_games.py run (its --dry-run).
+#
+# Page and script sizes only depend on the variant (template and gameType)
+# and the number of digits in the game number, so bytes, files and blocks
+# are counted exactly, one rendered page per class. Compression does depend
+# on the content, so the .gz size (as precompress.py writes it) is
+# extrapolated per template from a sample of the selected IDs. Wall time
+# comes from a probe: a slice of the selected games (a few thousand at most,
+# and never more than a tenth of the selection) is generated for real, with
+# the run's pipeline settings, into a scratch directory on --out's disk, and
+# the rate is scaled up to the whole selection. Nothing else is written, not
+# even --out itself.
+import gzip
+import math
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter
+
+import build_metrics
+import generate_million_games as million
+import selection
+
+SAMPLES_PER_TEMPLATE = 50
+PROBE_GAMES = 2000
+PROBE_SHARE = 10
+
+
+def sample_ids(selected, n):
+    # Up to n IDs spread evenly over the selection
+    total = selection.count(selected)
+    ids = []
+    for k in range(min(n, total)):
+        position = k * total // min(n, total)
+        for r in selected:
+            if position < len(r):
+                ids.append(r[position])
+                break
+            position -= len(r)
+    return ids
+
+
+def game_outputs(i, layout='flat', shared_runtime=False, minify=False):
+    # The bytes one game writes, as a list of files
+    if shared_runtime:
+        return [million.render_shared_page(i, layout, minify)]
+    return list(million.render_game(i, layout, minify))
+
+
+def shared_outputs(shared_runtime=False, minify=False):
+    outputs = []
+    if shared_runtime:
+        outputs.append(million.runtime(minify)[1])
+    if minify:
+        outputs.append(million.GAME_CSS)
+    return outputs
+
+
+def count_outputs(selected, layout='flat', shared_runtime=False, minify=False, block_size=4096):
+    # Exact (files, bytes, bytes on disk, bytes per template) for the selection
+    classes = Counter(i % million.VARIANTS * 10 + len(str(i)) for r in selected for i in r)
+    per_template = Counter()
+    files = size = allocated = 0
+    for key, games in classes.items():
+        variant, digits = divmod(key, 10)
+        # Any game of the class will do: the smallest with that many digits
+        first = 10 ** (digits - 1)
+        outputs = game_outputs(first + (variant - first) % million.VARIANTS, layout,
+                               shared_runtime, minify)
+        files += games * len(outputs)
+        page_bytes = sum(len(data) for data in outputs)
+        size += games * page_bytes
+        allocated += games * sum(_blocks(len(data), block_size) for data in outputs)
+        per_template[variant % len(million.game_templates)] += games * page_bytes
+    for data in shared_outputs(shared_runtime, minify):
+        files += 1
+        size += len(data)
+        allocated += _blocks(len(data), block_size)
+    return files, size, allocated, per_template
+
+
+def _blocks(size, block_size):
+    return max(1, math.ceil(size / block_size)) * block_size
+
+
+def count_dirs(selected, layout='flat'):
+    # Directories the layout creates below --out
+    dirs = set()
+    for leaf in {million.game_dir(i, layout) for r in selected for i in r} - {''}:
+        parts = leaf.rstrip('/').split('/')
+        dirs.update('/'.join(parts[:k]) for k in range(1, len(parts) + 1))
+    return len(dirs)
+
+
+def estimate_compressed(selected, per_template, layout='flat', shared_runtime=False,
+                        minify=False, samples=SAMPLES_PER_TEMPLATE):
+    # .gz bytes: each template's raw bytes scaled by its sampled ratio
+    total = 0
+    for t, raw in per_template.items():
+        ids = sample_ids(selection.every(selected, t, len(million.game_templates)), samples)
+        outputs = [data for i in ids for data in game_outputs(i, layout, shared_runtime, minify)]
+        ratio = (sum(len(gzip.compress(data, compresslevel=9, mtime=0)) for data in outputs)
+                 / sum(len(data) for data in outputs))
+        total += raw * ratio
+    for data in shared_outputs(shared_runtime, minify):
+        total += len(gzip.compress(data, compresslevel=9, mtime=0))
+    return round(total)
+
+
+def existing_dir(path):
+    # path, or its nearest ancestor that exists: where a run would create it
+    path = os.path.abspath(path)
+    while not os.path.isdir(path):
+        path = os.path.dirname(path)
+    return path
+
+
+def probe(out_dir, selected, layout='flat', shared_runtime=False, minify=False,
+          writers=million.WRITERS, queue_depth=million.QUEUE_DEPTH, games=PROBE_GAMES):
+    # (games, files, seconds) for generating a slice of the selection (at
+    # most games, and 1/PROBE_SHARE of it) into a scratch directory in
+    # out_dir, removed afterwards
+    r = max(selected, key=len)
+    games = max(1, min(games, selection.count(selected) // PROBE_SHARE))
+    step = r.step * math.ceil(len(r) / games)
+    scratch = tempfile.mkdtemp(prefix='.plan-', dir=out_dir)
+    try:
+        t0 = time.perf_counter()
+        _, _, manifest, errors = million.generate_shard(
+            r.start, r.stop, scratch, old={}, shared_runtime=shared_runtime, layout=layout,
+            step=step, minify=minify, writers=writers, queue_depth=queue_depth)
+        elapsed = time.perf_counter() - t0
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    if errors:
+        raise OSError(f'probe write failed for game{errors[0][0]}: {errors[0][1]}')
+    return len(range(r.start, r.stop, step)), manifest.written, elapsed
+
+
+def plan(args, selected):
+    # Prints the plan for the run args describes; returns 1 if it won't fit
+    games = selection.count(selected)
+    if not games:
+        print('Nothing selected; there is nothing to plan.')
+        return 0
+    target = existing_dir(args.out)
+    disk = os.statvfs(target)
+    block_size = disk.f_frsize or 4096
+    files, size, allocated, per_template = count_outputs(
+        selected, args.layout, args.shared_runtime, args.minify, block_size)
+    dirs = count_dirs(selected, args.layout)
+    compressed = estimate_compressed(selected, per_template, args.layout, args.shared_runtime,
+                                     args.minify)
+
+    print(f'Plan for {games:,} games ({args.layout} layout'
+          f'{", shared runtime" if args.shared_runtime else ""}'
+          f'{", minified" if args.minify else ""}) in {args.out}:')
+    print(f'  files:      {files:,} (+ {dirs:,} directories)')
+    print(f'  bytes:      {size:,} ({size / 1e6:,.1f} MB), {allocated / 1e6:,.1f} MB on disk '
+          f'in {block_size}-byte blocks')
+    print(f'  gzip -9:    ~{compressed / 1e6:,.1f} MB more for .gz siblings '
+          f'({compressed / size:.0%} of the pages, from {SAMPLES_PER_TEMPLATE} samples '
+          f'per template)')
+
+    probe_games, probe_files, seconds = probe(target, selected, args.layout,
+                                              args.shared_runtime, args.minify, args.writers,
+                                              args.queue_depth)
+    rate = probe_games / seconds
+    print(f'  probe:      {probe_games:,} games ({probe_files:,} files) in {seconds:.2f}s, '
+          f'{rate:,.0f} games/s with {args.writers} writer threads')
+    estimate = games / rate
+    line = f'  wall time:  ~{build_metrics.duration(estimate)} with -j 1'
+    workers = args.workers or os.cpu_count() or 1
+    if workers > 1:
+        line += f', ~{build_metrics.duration(estimate / workers)} at best with {workers} workers'
+    print(line)
+
+    free_bytes = disk.f_bavail * disk.f_frsize
+    print(f'  free:       {free_bytes / 1e6:,.1f} MB'
+          + (f', {disk.f_favail:,} inodes' if disk.f_files else ' (inodes not reported)'))
+    short = []
+    if allocated > free_bytes:
+        short.append(f'needs {(allocated - free_bytes) / 1e6:,.1f} MB more space')
+    if disk.f_files and files + dirs > disk.f_favail:
+        short.append(f'needs {files + dirs - disk.f_favail:,} more inodes')
+    if short:
+        print(f'Will not fit: {"; ".join(short)}.')
+        return 1
+    print('Fits. Nothing was generated; rerun without --dry-run to start.')
+    return 0
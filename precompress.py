@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# Write max-level .gz (and .br, when the brotli module is installed) siblings
+# next to every HTML/JS/CSS file, for servers that serve precompressed files.
+#
+# A sibling that is newer than its source is left alone, so reruns only
+# compress what changed. A sibling whose source is gone (pruned by a
+# generator's manifest, or moved by a layout switch) is removed, so it can't
+# be archived or deployed stale. Work is spread over a process pool.
+import argparse
+import gzip
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+EXTENSIONS = ('.html', '.js', '.css')
+SIBLINGS = ('.gz', '.br')
+SKIP_DIRS = {'.git', '__pycache__', 'node_modules'}
+
+
+def find_files(root):
+    # (sources, siblings): every HTML/JS/CSS file and every .gz/.br sibling
+    # of one, whether or not its source still exists
+    sources, siblings = [], []
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIP_DIRS and not entry.name.startswith('.'):
+                        stack.append(entry.path)
+                elif entry.name.endswith(EXTENSIONS):
+                    sources.append(entry.path)
+                elif entry.name.endswith(SIBLINGS) and entry.name[:-3].endswith(EXTENSIONS):
+                    siblings.append(entry.path)
+    return sources, siblings
+
+
+def remove_orphans(sources, siblings):
+    # Deletes the siblings whose source is gone; returns how many
+    sources = set(sources)
+    removed = 0
+    for sibling in siblings:
+        if sibling[:-3] not in sources:
+            try:
+                os.remove(sibling)
+            except FileNotFoundError:
+                continue
+            removed += 1
+    return removed
+
+
+def _is_fresh(path, source_mtime):
+    try:
+        return os.stat(path).st_mtime_ns >= source_mtime
+    except FileNotFoundError:
+        return False
+
+
+def compress_file(path, use_brotli=True):
+    # Returns (source bytes, {suffix: (source bytes, compressed bytes)},
+    # siblings written, siblings skipped); the first counts the source once
+    # however many siblings were written for it
+    source_mtime = os.stat(path).st_mtime_ns
+    targets = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if use_brotli and brotli is not None:
+        targets.append(('.br', lambda data: brotli.compress(data, quality=11)))
+
+    data = None
+    sizes = {}
+    written = skipped = 0
+    for suffix, compress in targets:
+        sibling = path + suffix
+        if _is_fresh(sibling, source_mtime):
+            skipped += 1
+            continue
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+        out = compress(data)
+        tmp = sibling + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(out)
+        os.replace(tmp, sibling)
+        sizes[suffix] = (len(data), len(out))
+        written += 1
+    return (0 if data is None else len(data)), sizes, written, skipped
+
+
+def _add(totals, result):
+    original, sizes, written, skipped = result
+    totals[0] += original
+    for suffix, (source, out) in sizes.items():
+        before, after = totals[1].get(suffix, (0, 0))
+        totals[1][suffix] = (before + source, after + out)
+    totals[2] += written
+    totals[3] += skipped
+
+
+def _compress_batch(paths, use_brotli):
+    totals = [0, {}, 0, 0]
+    for path in paths:
+        _add(totals, compress_file(path, use_brotli))
+    return totals
+
+
+def precompress(root='.', workers=None, use_brotli=True, batch_size=500):
+    # Returns (source files, orphan siblings removed, totals as compress_file)
+    paths, siblings = find_files(root)
+    paths.sort()
+    removed = remove_orphans(paths, siblings)
+    batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+    totals = [0, {}, 0, 0]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for result in pool.map(_compress_batch, batches, [use_brotli] * len(batches)):
+            _add(totals, result)
+    return len(paths), removed, totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write .gz/.br siblings for HTML, JS and CSS files.')
+    parser.add_argument('--out', default='.', help='site directory')
+    parser.add_argument('-j', '--workers', type=int, default=0,
+                        help='worker processes (default: every core)')
+    parser.add_argument('--no-brotli', action='store_true', help='only write .gz siblings')
+    args = parser.parse_args(argv)
+
+    use_brotli = not args.no_brotli
+    if use_brotli and brotli is None:
+        print('brotli module not installed; writing .gz siblings only')
+    count, removed, (original, sizes, written, skipped) = precompress(
+        args.out, args.workers or None, use_brotli)
+    print(f'{count} files: {written} siblings written, {skipped} up to date, '
+          f'{removed} orphans removed; {original:,} source bytes compressed')
+    for suffix, (source, out) in sorted(sizes.items(), key=lambda item: SIBLINGS.index(item[0])):
+        print(f'  {suffix}: {source:,} -> {out:,} bytes ({source - out:,} bytes saved)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
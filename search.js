@@ -0,0 +1,95 @@
+// Game search for index.html
+// Fetches only the index shard (search/<first two letters>.json) for each word
+// typed; the shards are written by build_search_index.py.
+(function () {
+    const input = document.getElementById('gameSearch');
+    const results = document.getElementById('searchResults');
+    if (!input || !results) return;
+
+    const PREFIX_LEN = 2;
+    const MAX_RESULTS = 30;
+    const shards = {};
+
+    function shardFile(prefix) {
+        if (/^[a-z0-9]+$/.test(prefix)) return `search/${prefix}.json`;
+        const hex = Array.from(new TextEncoder().encode(prefix), b => b.toString(16).padStart(2, '0')).join('');
+        return `search/x${hex}.json`;
+    }
+
+    function loadShard(prefix) {
+        if (!shards[prefix]) {
+            shards[prefix] = fetch(shardFile(prefix))
+                .then(r => r.ok ? r.json() : { tokens: {}, docs: [] })
+                .catch(() => ({ tokens: {}, docs: [] }));
+        }
+        return shards[prefix];
+    }
+
+    // Docs matching every token that starts with `word`, keyed by page
+    async function lookup(word) {
+        const shard = await loadShard(word.slice(0, PREFIX_LEN));
+        const found = new Map();
+        for (const token in shard.tokens) {
+            if (!token.startsWith(word)) continue;
+            for (const i of shard.tokens[token]) {
+                const doc = shard.docs[i];
+                found.set(doc.url + (doc.series ? doc.name : ''), doc);
+            }
+        }
+        return found;
+    }
+
+    // Series entries stand for every step-th game in a range
+    function expand(doc) {
+        if (!doc.series) return [doc];
+        const [first, last, step] = doc.series;
+        const games = [];
+        for (let n = first; n <= last && games.length < 3; n += step) {
+            games.push({ url: doc.url.replace('{n}', n), name: doc.name.replace('{n}', n), icon: doc.icon, desc: doc.desc });
+        }
+        return games;
+    }
+
+    function card(doc) {
+        const a = document.createElement('a');
+        a.href = doc.url;
+        a.className = 'game-card';
+        const icon = document.createElement('div');
+        icon.className = 'game-icon';
+        icon.textContent = doc.icon;
+        const name = document.createElement('h3');
+        name.textContent = doc.name;
+        const desc = document.createElement('p');
+        desc.textContent = doc.desc;
+        a.append(icon, name, desc);
+        return a;
+    }
+
+    let latest = 0;
+    async function search(query) {
+        const id = ++latest;
+        const words = (query.toLowerCase().match(/[\p{L}\p{N}_]+/gu) || []).filter(w => w.length >= PREFIX_LEN);
+        let matches = null;
+        for (const word of words) {
+            const found = await lookup(word);
+            matches = matches === null ? found : new Map([...matches].filter(([key]) => found.has(key)));
+        }
+        if (id !== latest) return;
+
+        results.replaceChildren();
+        if (matches === null) return;
+        const docs = [...matches.values()].flatMap(expand).slice(0, MAX_RESULTS);
+        if (docs.length === 0) {
+            const none = document.createElement('p');
+            none.textContent = 'No games found.';
+            results.append(none);
+        }
+        docs.forEach(doc => results.append(card(doc)));
+    }
+
+    let timer = null;
+    input.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(() => search(input.value), 150);
+    });
+})();
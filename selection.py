@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# Game ID selection shared by the generators and sitegen.py.
+#
+# --start/--end bound the run, --ids picks individual IDs and ranges
+# ("104,500-600") and --template narrows that to the games built from one
+# template, so a template change only rebuilds the games that use it.
+# Selections are lists of ranges, so even the million-game range costs
+# nothing to describe.
+import argparse
+
+
+def parse_ids(text):
+    # "5,10-20" -> [range(5, 6), range(10, 21)]
+    ranges = []
+    for part in text.split(','):
+        first, sep, last = part.strip().partition('-')
+        try:
+            ranges.append(range(int(first), int(last if sep else first) + 1))
+        except ValueError:
+            raise ValueError(f'bad game ID or range {part!r}') from None
+    return ranges
+
+
+def add_arguments(parser, first, last):
+    parser.add_argument('--start', type=int, default=first,
+                        help=f'first game number (default: {first})')
+    parser.add_argument('--end', type=int, default=last,
+                        help=f'last game number, inclusive (default: {last})')
+    parser.add_argument('--ids', type=_ids_argument, metavar='LIST',
+                        help='only these game numbers, e.g. 104,500-600')
+    parser.add_argument('--template', metavar='NAME',
+                        help='only the games built from this template')
+
+
+def _ids_argument(text):
+    try:
+        return parse_ids(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def ranges(args, first, last):
+    # Selected IDs as sorted, non-overlapping ranges within first..last
+    low, high = max(args.start, first), min(args.end, last) + 1
+    wanted = args.ids or [range(low, high)]
+    clipped = sorted((max(r.start, low), min(r.stop, high)) for r in wanted)
+    merged = []
+    for start, stop in clipped:
+        if start >= stop:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], stop)
+        else:
+            merged.append([start, stop])
+    return [range(start, stop) for start, stop in merged]
+
+
+def every(selected, offset, period):
+    # The IDs in `selected` with id % period == offset, still as ranges
+    matching = (range(r.start + (offset - r.start) % period, r.stop, period) for r in selected)
+    return [r for r in matching if r]
+
+
+def is_everything(args, first, last):
+    # Whether the selection is the generator's whole range, i.e. whether
+    # outputs it didn't produce may be pruned as stale
+    return not args.template and ranges(args, first, last) == [range(first, last + 1)]
+
+
+def count(selected):
+    return sum(len(r) for r in selected)
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# Local server that renders the million-game pages on demand.
+#
+# /gameN.html and /gameN.js for N in the million-game range, and their
+# sharded-layout paths (/games/NN/NN/gameN.*), are rendered from the
+# generate_million_games.py templates and kept in a bounded LRU cache;
+# everything else is served from the site directory. Responses carry an ETag
+# (If-None-Match gets a 304) and are gzipped when the client accepts it; the
+# gzipped variant has its own ETag.
+import argparse
+import asyncio
+import gzip
+import mimetypes
+import os
+import re
+import sys
+from collections import OrderedDict
+from urllib.parse import unquote, urlsplit
+
+import generate_million_games as million
+from build_manifest import content_hash
+
+GAME_PATH = re.compile(r'/(games/\d\d/\d\d/)?game(\d+)\.(html|js)')
+KINDS = ('html', 'js')
+COMPRESSIBLE = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+
+class Page:
+    __slots__ = ('body', 'etag', 'content_type', '_gzipped')
+
+    def __init__(self, body, content_type, etag=None):
+        self.body = body
+        self.content_type = content_type
+        self.etag = etag or f'"{content_hash(body)}"'
+        self._gzipped = None
+
+    def gzipped(self):
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=6, mtime=0)
+        return self._gzipped
+
+
+class LRUCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        page = self._entries.get(key)
+        if page is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return page
+
+    def put(self, key, page):
+        self._entries[key] = page
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class GameServer:
+    def __init__(self, root='.', cache_size=10000, shared_runtime=False):
+        self.root = os.path.realpath(root)
+        # Rendered pages link the site's hashed style.css, as generated ones do
+        million.link_site(self.root)
+        self.cache = LRUCache(cache_size)
+        self.shared_runtime = shared_runtime
+        self.runtime = Page(million.RUNTIME_JS, 'application/javascript')
+
+    def render(self, num, kind, layout='flat'):
+        key = (num, kind, layout)
+        page = self.cache.get(key)
+        if page is None:
+            if self.shared_runtime:
+                if kind == 'js':
+                    return None
+                page = Page(million.render_shared_page(num, layout), 'text/html; charset=utf-8')
+                self.cache.put(key, page)
+            else:
+                # Both pages come out of one render, and a browser asks for
+                # the script right after the page
+                html, js = million.render_game(num, layout)
+                pages = {'html': Page(html, 'text/html; charset=utf-8'),
+                         'js': Page(js, 'application/javascript')}
+                for page_kind, rendered in pages.items():
+                    self.cache.put((num, page_kind, layout), rendered)
+                page = pages[kind]
+        return page
+
+    def load_static(self, path):
+        # None (a 404) for anything that can't be served, including paths
+        # the OS rejects (an embedded NUL) and unreadable files
+        try:
+            full = os.path.realpath(os.path.join(self.root, path.lstrip('/')))
+            if full != self.root and not full.startswith(self.root + os.sep):
+                return None
+            if os.path.isdir(full):
+                full = os.path.join(full, 'index.html')
+            st = os.stat(full)
+            with open(full, 'rb') as f:
+                body = f.read()
+        except (ValueError, OSError):
+            return None
+        content_type = mimetypes.guess_type(full)[0] or 'application/octet-stream'
+        if content_type.startswith('text/'):
+            content_type += '; charset=utf-8'
+        return Page(body, content_type, etag=f'"{st.st_mtime_ns:x}-{st.st_size:x}"')
+
+    async def lookup(self, path):
+        match = GAME_PATH.fullmatch(path)
+        if match:
+            num, kind = int(match.group(2)), match.group(3)
+            layout = 'sharded' if match.group(1) else 'flat'
+            # Only the path the generator would write: no leading zeros, and
+            # the game's own shard directory
+            name = million.game_files(num, layout)[KINDS.index(kind)]
+            if million.FIRST_GAME <= num <= million.LAST_GAME and path == '/' + name:
+                return self.render(num, kind, layout)
+        if self.shared_runtime and path == '/' + million.RUNTIME_NAME:
+            return self.runtime
+        return await asyncio.get_running_loop().run_in_executor(None, self.load_static, path)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request = await reader.readuntil(b'\r\n\r\n')
+                lines = request.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ')
+                except ValueError:
+                    await self.respond(writer, 400, b'Bad Request')
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                # The next request starts after this one's body; a body we
+                # can't measure ends the connection instead
+                if 'transfer-encoding' in headers:
+                    keep_alive = False
+                try:
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self.respond(writer, 400, b'Bad Request')
+                    break
+                if length:
+                    await reader.readexactly(length)
+                if method not in ('GET', 'HEAD'):
+                    await self.respond(writer, 405, b'Method Not Allowed', keep_alive=keep_alive)
+                elif (page := await self.lookup(unquote(urlsplit(target).path))) is None:
+                    await self.respond(writer, 404, b'Not Found', keep_alive=keep_alive)
+                else:
+                    await self.send_page(writer, page, headers, method == 'HEAD', keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def send_page(self, writer, page, headers, head_only, keep_alive):
+        gzipped = ('gzip' in headers.get('accept-encoding', '')
+                   and page.content_type.startswith(COMPRESSIBLE))
+        # Each encoding is a different representation, so it gets its own
+        # strong ETag
+        etag = page.etag[:-1] + '-gzip"' if gzipped else page.etag
+        extra = {'ETag': etag, 'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+        if etag in headers.get('if-none-match', ''):
+            await self.respond(writer, 304, b'', keep_alive=keep_alive, headers=extra,
+                               send_body=False)
+            return
+        body = page.body
+        if gzipped:
+            body = page.gzipped()
+            extra['Content-Encoding'] = 'gzip'
+        extra['Content-Type'] = page.content_type
+        await self.respond(writer, 200, body, keep_alive=keep_alive, headers=extra,
+                           send_body=not head_only)
+
+    async def respond(self, writer, status, body, keep_alive=False, headers=None, send_body=True):
+        reason = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+                  405: 'Method Not Allowed'}[status]
+        lines = [f'HTTP/1.1 {status} {reason}']
+        for name, value in (headers or {'Content-Type': 'text/plain'}).items():
+            lines.append(f'{name}: {value}')
+        if status != 304:
+            lines.append(f'Content-Length: {len(body)}')
+        lines.append(f'Connection: {"keep-alive" if keep_alive else "close"}')
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        if send_body and status != 304:
+            writer.write(body)
+        await writer.drain()
+
+
+async def serve(host, port, server):
+    listener = await asyncio.start_server(server.handle, host, port)
+    print(f'Serving {server.root} on http://{host}:{port}/ '
+          f'(games {million.FIRST_GAME}-{million.LAST_GAME} rendered on demand)')
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the site, rendering million-range games on demand.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--root', default='.', help='directory for static files')
+    parser.add_argument('--cache-size', type=int, default=10000,
+                        help='rendered pages kept in the LRU cache')
+    parser.add_argument('--shared-runtime', action='store_true',
+                        help='serve pages that load the shared runtime script')
+    args = parser.parse_args(argv)
+
+    server = GameServer(args.root, args.cache_size, args.shared_runtime)
+    try:
+        asyncio.run(serve(args.host, args.port, server))
+    except KeyboardInterrupt:
+        print(f'Stopped. Cache: {server.cache.hits} hits, {server.cache.misses} misses')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# One entry point for the site generators.
+#
+#     python3 sitegen.py classic --template tetris
+#     python3 sitegen.py million --ids 104,5000-6000 --out site
+#     python3 sitegen.py million --template Click -j 0
+#     python3 sitegen.py fix --ids 11 --out site
+#     python3 sitegen.py index million-games --out site
+#     python3 sitegen.py sitemap --base-url https://example.netlify.app --gzip
+#     python3 sitegen.py sync ../deploy
+#
+# Each subcommand runs one generator with the rest of the command line. The
+# generators take --start/--end/--ids/--template/--out (see selection.py) and
+# only touch the games selected, so a template change rebuilds just its slice;
+# "<command> --help" lists everything a command accepts.
+import argparse
+import importlib
+import sys
+
+COMMANDS = {
+    'classic': ('generate_games', 'classic game pages, games 2-103'),
+    'million': ('generate_million_games', 'the million-game range, games 104-1000103'),
+    'fix': ('fix_all_games', 'playable scripts for games 1-103'),
+    'index': ('assemble_index', 'the generated sections of index.html'),
+    'sitemap': ('build_sitemap', 'sitemaps for the million-game range (needs --base-url)'),
+    'params': ('game_params', 'per-game tuning table read by game_dynamic.html (needs NumPy)'),
+    'sw': ('build_service_worker', 'service worker and precache manifest for shared files'),
+    'check': ('validate_site', 'broken links, orphans and damaged files in the built site'),
+    'sync': ('sync_deploy', 'copy what changed in the build to a deploy directory'),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Generate the site, or any slice of it.',
+        epilog='commands:\n' + '\n'.join(f'  {name:10} {text}' for name, (_, text)
+                                           in COMMANDS.items()),
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=COMMANDS, metavar='command')
+    parser.add_argument('args', nargs=argparse.REMAINDER,
+                        help='options for the command, e.g. --ids 104-200 --out site')
+    args = parser.parse_args(argv)
+
+    # The command's own usage and errors name it as run: "sitegen.py classic"
+    module = importlib.import_module(COMMANDS[args.command][0])
+    return module.main(args.args, prog=f'{parser.prog} {args.command}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
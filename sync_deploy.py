@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# Delta sync of the built site to a deploy directory.
+#
+# The deploy directory stands in for the host: it keeps a manifest of what
+# was last published there (path -> size, mtime, content hash). A sync walks
+# the build, trusts the recorded hash of any file whose size and mtime are
+# unchanged, hashes the rest across a process pool, copies only the files
+# that were added or whose content changed, removes the ones that are gone
+# and writes the new manifest. A redeploy after a template change copies
+# that template's slice, not the million-file tree.
+#
+#     python3 sync_deploy.py ../deploy
+#     python3 sync_deploy.py ../deploy --dry-run
+import argparse
+import fnmatch
+import json
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from build_manifest import content_hash
+
+MANIFEST_NAME = '.deploy-manifest.json'
+# Never published: VCS and tool state, dotfiles (the generators' manifests
+# and checkpoints) and the temp files an interrupted write leaves behind.
+# Dotfiles the host reads are the exception.
+SKIP_DIRS = {'.git', '__pycache__', 'node_modules'}
+EXCLUDE = ('*.py', '*.pyc', '*.tmp', 'requests.jsonl')
+PUBLISHED_DOTFILES = {'.nojekyll'}
+BATCH_SIZE = 500
+
+
+def find_files(root, exclude=EXCLUDE, skip=()):
+    # {relative path: (size, mtime_ns)} for every file to publish
+    files = {}
+    stack = ['']
+    while stack:
+        rel_dir = stack.pop()
+        with os.scandir(os.path.join(root, rel_dir)) as entries:
+            for entry in entries:
+                rel = f'{rel_dir}{entry.name}'
+                if entry.name.startswith('.') and entry.name not in PUBLISHED_DOTFILES:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIP_DIRS and os.path.abspath(entry.path) not in skip:
+                        stack.append(rel + '/')
+                elif entry.is_file() and not any(fnmatch.fnmatch(entry.name, pattern)
+                                                 for pattern in exclude):
+                    st = entry.stat()
+                    files[rel] = (st.st_size, st.st_mtime_ns)
+    return files
+
+
+def load_snapshot(target):
+    try:
+        with open(os.path.join(target, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)['files']
+    except FileNotFoundError:
+        return {}
+    except (ValueError, KeyError):
+        print(f'Ignoring unreadable deploy manifest in {target}; copying everything')
+        return {}
+
+
+def _sync_batch(root, target, batch, dry_run):
+    # Hashes each (path, old hash) and copies it when the content differs;
+    # returns [(path, hash, copied)]
+    results = []
+    for rel, old_digest in batch:
+        with open(os.path.join(root, rel), 'rb') as f:
+            digest = content_hash(f.read())
+        copied = digest != old_digest
+        if copied and not dry_run:
+            copy_file(os.path.join(root, rel), os.path.join(target, rel))
+        results.append((rel, digest, copied))
+    return results
+
+
+def copy_file(src, dst):
+    # Temp file + rename, so the target never serves a half-copied file
+    tmp = dst + '.tmp'
+    try:
+        shutil.copyfile(src, tmp)
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        shutil.copyfile(src, tmp)
+    try:
+        os.replace(tmp, dst)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def remove_file(target, rel):
+    try:
+        os.remove(os.path.join(target, rel))
+    except FileNotFoundError:
+        pass
+    subdir = os.path.dirname(rel)
+    while subdir:
+        try:
+            os.rmdir(os.path.join(target, subdir))
+        except OSError:
+            return
+        subdir = os.path.dirname(subdir)
+
+
+def sync(root, target, workers=None, exclude=EXCLUDE, dry_run=False, batch_size=BATCH_SIZE):
+    # Returns counts: added, changed, deleted, unchanged (stat matched),
+    # rehashed (stat changed, content didn't) and bytes copied
+    old = load_snapshot(target)
+    current = find_files(root, exclude, skip={os.path.abspath(target)})
+    snapshot = {}
+    stats = dict.fromkeys(('added', 'changed', 'deleted', 'unchanged', 'rehashed',
+                           'bytes'), 0)
+
+    to_hash = []
+    for rel, (size, mtime) in current.items():
+        entry = old.get(rel)
+        if entry and entry[0] == size and entry[1] == mtime:
+            snapshot[rel] = entry
+            stats['unchanged'] += 1
+        else:
+            to_hash.append((rel, entry[2] if entry else None))
+
+    batches = [to_hash[k:k + batch_size] for k in range(0, len(to_hash), batch_size)]
+    if not dry_run:
+        os.makedirs(target, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for results in pool.map(_sync_batch, [root] * len(batches), [target] * len(batches),
+                                batches, [dry_run] * len(batches)):
+            for rel, digest, copied in results:
+                size, mtime = current[rel]
+                snapshot[rel] = [size, mtime, digest]
+                if not copied:
+                    stats['rehashed'] += 1
+                    continue
+                stats['changed' if rel in old else 'added'] += 1
+                stats['bytes'] += size
+
+    # Removed only once everything new is in place
+    for rel in sorted(old.keys() - current.keys()):
+        stats['deleted'] += 1
+        if not dry_run:
+            remove_file(target, rel)
+
+    if not dry_run:
+        tmp = os.path.join(target, MANIFEST_NAME + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'files': snapshot}, f, separators=(',', ':'),
+                      sort_keys=True)
+        os.replace(tmp, os.path.join(target, MANIFEST_NAME))
+    return stats
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(description='Copy what changed in the build to a deploy '
+                                                 'directory.', prog=prog)
+    parser.add_argument('target', help='deploy directory (created if missing)')
+    parser.add_argument('--out', default='.', help='site directory to publish (default: .)')
+    parser.add_argument('-j', '--workers', type=int, default=0,
+                        help='hashing processes (default: every core)')
+    parser.add_argument('--exclude', action='append', default=[], metavar='PATTERN',
+                        help='file name pattern not to publish, on top of '
+                             f'{", ".join(EXCLUDE)} and dotfiles other than '
+                             f'{", ".join(sorted(PUBLISHED_DOTFILES))}; repeatable')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='report what would be copied and deleted without touching the '
+                             'deploy directory')
+    args = parser.parse_args(argv)
+
+    stats = sync(args.out, args.target, args.workers or None, EXCLUDE + tuple(args.exclude),
+                 args.dry_run)
+    verb = 'would be' if args.dry_run else 'were'
+    print(f'{stats["added"]} added, {stats["changed"]} changed, {stats["deleted"]} deleted '
+          f'({stats["bytes"]:,} bytes {verb} copied); {stats["unchanged"]} unchanged, '
+          f'{stats["rehashed"]} rehashed but unchanged')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
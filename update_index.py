@@ -1,4 +1,6 @@
 #!/usr/bin/env python3
+from assemble_index import assemble
+
 games = [
     ("Memory Match", "🧠", "Match pairs of cards", "game01"),
     ("Breakout", "🎯", "Break blocks with a bouncing ball", "game02"),
@@ -105,16 +107,55 @@ games = [
     ("Rainbow", "🌈", "Follow the rainbow", "game103"),
 ]
 
-html_cards = []
-for name, icon, desc, file in games:
-    html_cards.append(f'''                <a href="{file}.html" class="game-card">
-                    <div class="game-icon">{icon}</div>
-                    <h3>{name}</h3>
-                    <p>{desc}</p>
-                </a>''')
 
-with open('game_cards.txt', 'w', encoding='utf-8') as f:
-    f.write('\n'.join(html_cards))
+# index.html sections and the games listed in each, in page order
+sections = [
+    ("Puzzle Games", ["game01", "game07", "game12", "game13", "game14", "game15", "game20"]),
+    ("Card & Casino Games", ["game21", "game22", "game23", "game24", "game25"]),
+    ("Strategy Games", ["game16", "game17", "game18", "game19"]),
+    ("Arcade Games", ["game02", "game03", "game04", "game05", "game06", "game08", "game09",
+                      "game10", "game11"]),
+    ("Sports Games", ["game26", "game27", "game28", "game29", "game30", "game31", "game32",
+                      "game33", "game34", "game35", "game36", "game37", "game38", "game39"]),
+    ("Action & Adventure", ["game40", "game41", "game42", "game43", "game44", "game53", "game54",
+                            "game55", "game56", "game57", "game58", "game59", "game60", "game61",
+                            "game62"]),
+    ("Vehicles & Transportation", ["game45", "game46", "game47", "game48", "game49", "game50",
+                                   "game51", "game52"]),
+    ("Sci-Fi & Space", ["game63", "game64", "game65", "game66", "game67", "game68", "game69",
+                        "game70", "game71", "game72", "game73"]),
+    ("Treasure & Collectibles", ["game74", "game75", "game76", "game77", "game78", "game79",
+                                 "game80", "game81", "game82", "game83", "game84"]),
+    ("Fantasy & Magic", ["game85", "game86", "game87", "game88", "game89", "game90", "game91",
+                         "game92", "game93", "game94", "game95", "game96", "game97", "game98",
+                         "game99", "game100", "game101", "game102", "game103"]),
+]
+
+
+def section_lines():
+    # Body of the "catalog" section of index.html (see assemble_index.py)
+    by_file = {file: (name, icon, desc) for name, icon, desc, file in games}
+    for n, (title, files) in enumerate(sections):
+        if n:
+            yield ''
+        yield '            <div class="game-section">'
+        yield f'                <h2 class="section-title">{title}</h2>'
+        yield '                <div class="game-grid">'
+        for file in files:
+            name, icon, desc = by_file[file]
+            yield f'                    <a href="{file}.html" class="game-card">'
+            yield f'                        <div class="game-icon">{icon}</div>'
+            yield f'                        <h3>{name}</h3>'
+            yield f'                        <p>{desc}</p>'
+            yield '                    </a>'
+        yield '                </div>'
+        yield '            </div>'
+
+
+def main():
+    changed = assemble('index.html', {'catalog': section_lines})
+    print(f'{"Updated" if changed else "Unchanged"} game catalog in index.html')
 
-print('Generated game_cards.txt with all game cards')
 
+if __name__ == '__main__':
+    main()
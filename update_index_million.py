@@ -1,39 +1,24 @@
 #!/usr/bin/env python3
+import argparse
+import os
+import sys
 
-# Read current index.html
-with open('index.html', 'r', encoding='utf-8') as f:
-    content = f.read()
+from assemble_index import MarkerError, assemble
 
-# Find where to insert new games
-insert_point = content.find('</div>\n        </div>\n        \n        <div style="text-align: center')
-
-# Generate game cards for games 104-1000103
-game_cards = []
-game_templates = [
-    ("Click", "🎯"),
-    ("Shoot", "🔫"),
-    ("Collect", "💰"),
-    ("Avoid", "⚠️"),
-    ("Match", "🔗"),
-    ("Race", "🏎️"),
-    ("Jump", "🦘"),
-    ("Puzzle", "🧩"),
-    ("Defend", "🛡️"),
-    ("Attack", "⚔️"),
-]
-
-# Generate cards in batches to avoid huge file
-# We'll create a dynamic loading system instead
-new_section = '''
-                <!-- Dynamic Games Section - 1,000,000 games available -->
-                <div id="dynamicGames" style="grid-column: 1 / -1;">
-                    <h2 style="color: #667eea; text-align: center; margin: 20px;">🎮 1,000,000+ More Games</h2>
+# Dynamic loading section: players enter any game number and
+# game_dynamic.html renders that game in the browser, so the section doesn't
+# depend on which games were generated or how they are laid out; a few
+# example games are previewed
+SECTION = '''            <!-- Dynamic Games Section -->
+            <div class="game-section" id="dynamicGames">
+                    <h2 style="color: #667eea; text-align: center; margin: 20px;">🎮 INFINITE GAMES!</h2>
                     <p style="text-align: center; color: #666; margin-bottom: 20px;">
-                        Games are loaded dynamically. Enter a game number (104-1000103) to play!
+                        Games are loaded dynamically. Enter ANY game number (104 or higher) to play!
                     </p>
                     <div style="text-align: center; margin: 20px;">
-                        <input type="number" id="gameNumber" placeholder="Enter game number (104-1000103)" 
-                               style="padding: 10px; font-size: 16px; width: 300px; border-radius: 5px; border: 2px solid #667eea;">
+                        <input type="text" id="gameNumber" placeholder="Enter any game number (e.g. 9999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999)" 
+                               style="padding: 10px; font-size: 16px; width: 90%; max-width: 800px; border-radius: 5px; border: 2px solid #667eea;">
+                        <br><br>
                         <button onclick="loadGame()" 
                                 style="padding: 10px 20px; font-size: 16px; background: #667eea; color: white; border: none; border-radius: 5px; cursor: pointer; margin-left: 10px;">
                             Play Game
@@ -47,13 +32,20 @@ new_section = '''
                 <script>
                 function loadGame() {
                     const num = document.getElementById('gameNumber').value;
-                    if (num >= 104 && num <= 1000103) {
-                        window.location.href = `game${num}.html`;
+                    if (num && (parseInt(num) >= 104 || num.length > 0)) {
+                        window.location.href = `game_dynamic.html?n=${num}`;
                     } else {
-                        alert('Please enter a number between 104 and 1000103');
+                        alert('Please enter a game number (104 or higher)');
                     }
                 }
                 
+                // Allow Enter key to load game
+                document.getElementById('gameNumber').addEventListener('keypress', function(e) {
+                    if (e.key === 'Enter') {
+                        loadGame();
+                    }
+                });
+                
                 // Show preview of some games
                 function showPreview() {
                     const preview = document.getElementById('gamePreview');
@@ -70,29 +62,54 @@ new_section = '''
                         {name: "Attack", icon: "⚔️"},
                     ];
                     
-                    for (let i = 0; i < 20; i++) {
-                        const gameNum = 104 + i * 50000;
+                    // Show some example games with huge numbers
+                    const exampleGames = [
+                        104, 1000, 10000, 100000, 1000000, 10000000, 100000000,
+                        '9999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999999',
+                        '123456789012345678901234567890123456789012345678901234567890',
+                        '999888777666555444333222111000999888777666555444333222111000'
+                    ];
+                    
+                    exampleGames.forEach((gameNum, i) => {
                         const template = templates[i % templates.length];
                         const card = document.createElement('a');
-                        card.href = `game${gameNum}.html`;
+                        card.href = `game_dynamic.html?n=${gameNum}`;
                         card.className = 'game-card';
                         card.innerHTML = `
                             <div class="game-icon">${template.icon}</div>
-                            <h3>${template.name} Game ${gameNum}</h3>
-                            <p>Game #${gameNum}</p>
+                            <h3>${template.name} Game</h3>
+                            <p>Game #${String(gameNum).length > 20 ? String(gameNum).substring(0, 20) + '...' : gameNum}</p>
                         `;
                         preview.appendChild(card);
-                    }
+                    });
                 }
                 showPreview();
                 </script>
+            </div>
 '''
 
-# Insert before the closing div
-new_content = content[:insert_point] + new_section + content[insert_point:]
 
-with open('index.html', 'w', encoding='utf-8') as f:
-    f.write(new_content)
+def section_lines():
+    # Body of the "million-games" section of index.html (see assemble_index.py)
+    return SECTION.splitlines()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Regenerate the million-games section of index.html.')
+    parser.add_argument('--out', default='.', help='site directory')
+    args = parser.parse_args(argv)
+    index = os.path.join(args.out, 'index.html')
+    try:
+        changed = assemble(index, {'million-games': section_lines})
+    except MarkerError as e:
+        print(f'Error: {e}')
+        return 1
+    except OSError as e:
+        print(f'Error: cannot update {index}: {e.strerror}')
+        return 1
+    print(f'{"Updated" if changed else "Unchanged"} dynamic game loading system in {index}')
+    return 0
 
-print('Updated index.html with dynamic game loading system')
 
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# Link and integrity check for the built site.
+#
+# Walks the tree with os.scandir, then has a process pool map every page and
+# script and run one regex over the mapping for the local files it refers to
+# (href/src attributes and quoted "*.html"/"*.js"/"*.css" paths in scripts).
+# Reports:
+#   missing    a reference to a file that isn't there
+#   orphan     an HTML/JS/CSS file nothing refers to (pages loadGame() can
+#              open, entry pages, and sources whose hash_assets.py copy is
+#              linked instead, count as referred to)
+#   empty      zero-byte files
+#   truncated  pages without a closing </html>, and leftover .tmp files from
+#              an interrupted write
+#   bounds     loadGame()'s game number bounds in index.html against the
+#              gameN.html pages that exist
+#
+# and, without counting them as problems, notes such as generated pages that
+# are only reachable by URL because loadGame() opens game_dynamic.html.
+#
+#     python3 validate_site.py --out site -j 0
+import argparse
+import mmap
+import os
+import posixpath
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from generate_million_games import FIRST_GAME, RESOLVER_NAME
+from hash_assets import HASHED, load_map
+
+SKIP_DIRS = {'.git', '__pycache__', 'node_modules'}
+SCANNED = ('.html', '.js')
+LINKABLE = ('.html', '.js', '.css')
+ENTRY_PAGES = {'index.html', '404.html', RESOLVER_NAME}
+BATCH_SIZE = 2000
+
+# One pattern per attribute, so each starts with a literal the regex engine
+# can skip ahead to; quoted paths are only searched for in files that
+# mention an extension at all
+ATTRIBUTES = [re.compile(rb'''href\s*=\s*["']([^"'#?]+)'''),
+              re.compile(rb'''src\s*=\s*["']([^"'#?]+)''')]
+QUOTED_PATH = re.compile(rb'''[`'"]([\w./-]+\.(?:html|js|css))(?=[?#`'"])''')
+EXTENSIONS = (b'.html', b'.js', b'.css')
+GAME_PAGE = re.compile(r'(?:^|/)game(\d+)\.html$')
+LOAD_GAME = re.compile(r'function loadGame\(\)\s*\{(.*?)\n\s*\}', re.S)
+LOWER = re.compile(r'(?:num\)?)\s*>=\s*(\d+)')
+UPPER = re.compile(r'(?:num\)?)\s*<=\s*(\d+)')
+# A gameN.html URL built from the number, or the page that renders any game
+OPENS_PAGE = re.compile(r'game\$\{')
+OPENS_DYNAMIC = re.compile(r'game_dynamic\.html')
+# Reported but not counted as problems
+NOTES = {'note'}
+
+
+def find_files(root):
+    # {relative path: size}
+    files = {}
+    stack = ['']
+    while stack:
+        rel_dir = stack.pop()
+        with os.scandir(os.path.join(root, rel_dir)) as entries:
+            for entry in entries:
+                if entry.name.startswith('.') and not entry.name.endswith('.tmp'):
+                    continue
+                rel = f'{rel_dir}{entry.name}'
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIP_DIRS:
+                        stack.append(rel + '/')
+                elif entry.is_file():
+                    files[rel] = entry.stat().st_size
+    return files
+
+
+def resolve(page, ref):
+    # The site path a reference from page points at, or None if it isn't a
+    # local file (URLs, data:, javascript:, templated paths)
+    ref = ref.decode('utf-8', 'replace').strip()
+    if not ref or ':' in ref or ref.startswith('//') or '$' in ref or '{' in ref:
+        return None
+    if ref.startswith('/'):
+        path = posixpath.normpath(ref.lstrip('/'))
+    else:
+        path = posixpath.normpath(posixpath.join(posixpath.dirname(page), ref))
+    return None if path.startswith('..') or path == '.' else path
+
+
+def _scan_batch(root, pages):
+    # Returns ({target: first page referring to it}, [truncated pages])
+    targets = {}
+    truncated = []
+    resolved = {}
+    for page in pages:
+        with open(os.path.join(root, page), 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                refs = [match.group(1) for pattern in ATTRIBUTES for match in pattern.finditer(m)]
+                if any(m.find(ext) != -1 for ext in EXTENSIONS):
+                    refs.extend(match.group(1) for match in QUOTED_PATH.finditer(m))
+                if page.endswith('.html') and m.rfind(b'</html>') == -1:
+                    truncated.append(page)
+        # Relative paths resolve against the file's own directory (a
+        # script's pages sit next to it, as in the sharded layout), a
+        # hash_assets.py copy's against its source's; only a leading / means
+        # the site root
+        copy = HASHED.match(page)
+        directory = posixpath.dirname(copy.group(1) if copy else page)
+        for ref in refs:
+            # Pages in one directory mostly share their references
+            key = directory, ref
+            if key not in resolved:
+                resolved[key] = resolve(posixpath.join(directory, 'page'), ref)
+            target = resolved[key]
+            if target is not None and target != page:
+                targets.setdefault(target, page)
+    return targets, truncated
+
+
+def load_game_bounds(root):
+    # (lowest, highest, opens gameN.html pages, opens game_dynamic.html)
+    # from index.html's loadGame(); a bound it doesn't check is None
+    try:
+        with open(os.path.join(root, 'index.html'), 'r', encoding='utf-8') as f:
+            m = LOAD_GAME.search(f.read())
+    except FileNotFoundError:
+        return None
+    if not m:
+        return None
+    lower, upper = LOWER.search(m.group(1)), UPPER.search(m.group(1))
+    return (int(lower.group(1)) if lower else None, int(upper.group(1)) if upper else None,
+            OPENS_PAGE.search(m.group(1)) is not None,
+            OPENS_DYNAMIC.search(m.group(1)) is not None)
+
+
+def as_ranges(numbers):
+    # Sorted numbers as "a-b" runs
+    runs = []
+    for n in numbers:
+        if runs and runs[-1][1] == n - 1:
+            runs[-1][1] = n
+        else:
+            runs.append([n, n])
+    return [f'{a}-{b}' if a != b else str(a) for a, b in runs]
+
+
+def check_bounds(bounds, games):
+    # (findings, notes) for loadGame() against the generated game numbers
+    generated = sorted(n for n in games if n >= FIRST_GAME)
+    if bounds is None:
+        return ['index.html has no loadGame()'] if generated else [], []
+    lower, upper, opens_pages, opens_dynamic = bounds
+    if not opens_pages:
+        if not generated:
+            return [], []
+        message = f'{len(generated):,} generated pages are only reachable by URL'
+        if opens_dynamic:
+            # game_dynamic.html plays any number, so nothing is broken
+            return [], [f'loadGame() opens game_dynamic.html; {message}']
+        return [f'loadGame() does not open gameN.html; {message}'], []
+    findings = []
+    if lower is None or upper is None:
+        findings.append(f'loadGame() opens gameN.html without a '
+                        f'{"lower" if lower is None else "upper"} bound')
+    lower = FIRST_GAME if lower is None else lower
+    upper = (generated[-1] if generated else lower) if upper is None else upper
+    missing = sorted(set(range(lower, upper + 1)) - games)
+    if missing:
+        findings.append(f'loadGame() accepts {lower}-{upper} but {len(missing):,} pages are '
+                        f'missing: {", ".join(as_ranges(missing)[:10])}')
+    outside = [n for n in generated if not lower <= n <= upper]
+    if outside:
+        findings.append(f'{len(outside):,} generated pages are outside loadGame()\'s '
+                        f'{lower}-{upper}: {", ".join(as_ranges(outside)[:10])}')
+    return findings, []
+
+
+def validate(root='.', workers=None, batch_size=BATCH_SIZE):
+    # {category: [finding, ...]}
+    files = find_files(root)
+    pages = sorted(name for name in files if name.endswith(SCANNED) and files[name])
+    batches = [pages[k:k + batch_size] for k in range(0, len(pages), batch_size)]
+    targets = {}
+    truncated = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for batch_targets, batch_truncated in pool.map(_scan_batch, [root] * len(batches),
+                                                       batches):
+            for target, page in batch_targets.items():
+                targets.setdefault(target, page)
+            truncated.extend(batch_truncated)
+
+    games = {}
+    for name in files:
+        m = GAME_PAGE.search(name)
+        if m:
+            games[int(m.group(1))] = name
+    bounds = load_game_bounds(root)
+    # Game pages loadGame() can open are reachable; if it opens none, the
+    # bounds finding covers them rather than a million orphans
+    lower, upper = FIRST_GAME, float('inf')
+    if bounds and bounds[2]:
+        lower, upper = bounds[0] or lower, bounds[1] or upper
+    reachable = {name for n, name in games.items() if lower <= n <= upper}
+    # Pages link hash_assets.py copies in place of these
+    copied = load_map(root).keys()
+    bound_findings, notes = check_bounds(bounds, set(games))
+
+    return {
+        'missing': sorted(f'{page} -> {target}' for target, page in targets.items()
+                          if target not in files and target + '/index.html' not in files),
+        'orphan': sorted(name for name in files
+                         if name.endswith(LINKABLE) and name not in targets
+                         and name not in ENTRY_PAGES and name not in reachable
+                         and name not in copied),
+        'empty': sorted(name for name, size in files.items() if size == 0),
+        'truncated': sorted(truncated + [name for name in files if name.endswith('.tmp')]),
+        'bounds': bound_findings,
+        'note': notes,
+    }
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(description='Check the built site for broken links, '
+                                                 'orphans and damaged files.', prog=prog)
+    parser.add_argument('--out', default='.', help='site directory')
+    parser.add_argument('-j', '--workers', type=int, default=0,
+                        help='worker processes (default: every core)')
+    parser.add_argument('--show', type=int, default=20, metavar='N',
+                        help='findings listed per category (default: 20)')
+    parser.add_argument('--no-orphans', action='store_true',
+                        help='don\'t report orphans (e.g. scripts only loaded dynamically)')
+    args = parser.parse_args(argv)
+
+    findings = validate(args.out, args.workers or None)
+    if args.no_orphans:
+        findings['orphan'] = []
+    for category, items in findings.items():
+        if not items:
+            continue
+        print(f'{category}: {len(items):,}')
+        for item in items[:args.show]:
+            print(f'  {item}')
+        if len(items) > args.show:
+            print(f'  ... and {len(items) - args.show:,} more')
+    total = sum(len(items) for category, items in findings.items() if category not in NOTES)
+    print(f'{total:,} problems' if total else 'No problems found')
+    return 1 if total else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# Render/write pipeline: the caller renders, a pool of writer threads writes.
+#
+# Rendering is CPU work and writing is mostly waiting on the disk, so instead
+# of alternating between the two the renderer hands each file to a bounded
+# queue that writer threads drain through Manifest.store() (which releases
+# the GIL in open/write/rename). When the writers fall behind, put() blocks,
+# so no more than `depth` rendered files are ever held in memory.
+#
+# Failures are per key (the game number): an OSError marks that key failed
+# and the rest carry on, like the serial loop. Anything else stops the
+# pipeline: queued files are dropped, the writers exit, and the exception is
+# re-raised to the renderer from put() or close().
+import queue
+import threading
+
+WRITERS = 4
+QUEUE_DEPTH = 256
+
+_STOP = object()
+
+
+class WritePipeline:
+    def __init__(self, manifest, writers=WRITERS, depth=QUEUE_DEPTH):
+        # writers=0 writes in the caller's thread, with no queue
+        self.manifest = manifest
+        self.errors = {}
+        self._queue = queue.Queue(maxsize=max(depth, 1))
+        self._lock = threading.Lock()
+        self._failure = None
+        self._aborted = threading.Event()
+        self._threads = [threading.Thread(target=self._drain, name=f'writer-{n}', daemon=True)
+                         for n in range(writers)]
+        for t in self._threads:
+            t.start()
+
+    def put(self, key, name, data):
+        if not self._threads:
+            self._write(key, name, data)
+            return
+        # Blocks while the queue is full, waking up to notice a dead pipeline
+        while True:
+            self._check()
+            try:
+                self._queue.put((key, name, data), timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def close(self, abort=False):
+        # Waits for queued files to be written (or, with abort, drops them)
+        # and re-raises a writer's failure
+        if abort:
+            self._aborted.set()
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for t in self._threads:
+            t.join()
+        self._threads = []
+        if not abort:
+            self._check()
+
+    def _check(self):
+        if self._failure is not None:
+            raise self._failure
+
+    def _drain(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            if self._aborted.is_set():
+                continue
+            try:
+                self._write(*item)
+            except BaseException as e:
+                with self._lock:
+                    if self._failure is None:
+                        self._failure = e
+                self._abort()
+
+    def _abort(self):
+        # Drops whatever is queued so close() (and a blocked put()) returns
+        self._aborted.set()
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is _STOP:
+                # Keep it for a writer that hasn't seen its own yet
+                self._queue.put(item)
+                return
+
+    def _write(self, key, name, data):
+        if key in self.errors:
+            return
+        try:
+            digest, written = self.manifest.store(name, data)
+        except OSError as e:
+            with self._lock:
+                self.errors.setdefault(key, str(e))
+            return
+        with self._lock:
+            self.manifest.record(name, digest, written, len(data))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(abort=exc_type is not None)